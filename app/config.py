@@ -22,15 +22,38 @@ COLLECTION_NAME = os.environ.get("COLLECTION_NAME", "gurbani_english_enhanced")
 # Embedding model settings
 EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "nomic-embed-text")
 OLLAMA_API_URL = os.environ.get("OLLAMA_API_URL", "http://localhost:11434/api/embeddings")
+# Root of the Ollama server, used for the other API endpoints
+OLLAMA_BASE_URL = OLLAMA_API_URL.rsplit("/api/", 1)[0]
+# Maximum concurrent generation requests sent to Ollama. The limit is per
+# worker process, so up to WEB_CONCURRENCY * OLLAMA_CONCURRENCY generations
+# can reach the server at once; size the product against OLLAMA_NUM_PARALLEL
+OLLAMA_CONCURRENCY = int(os.environ.get("OLLAMA_CONCURRENCY", "2"))
+# Maximum concurrent batched query embedding requests per worker, kept
+# separate so long-running generations never hold up query embeddings
+OLLAMA_EMBED_CONCURRENCY = int(os.environ.get("OLLAMA_EMBED_CONCURRENCY", "4"))
+# Load the embedding and generation models into Ollama on startup
+OLLAMA_WARMUP = os.environ.get("OLLAMA_WARMUP", "true").lower() == "true"
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "15m")
+# Truncate embeddings to this many dimensions (0 keeps the model's full size)
+EMBEDDING_DIM = int(os.environ.get("EMBEDDING_DIM", "0"))
 
 # Application settings
 HOST = os.environ.get("HOST", "0.0.0.0")
 PORT = int(os.environ.get("PORT", "8001"))
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+ENV = os.environ.get("ENV", "production")
+ALLOWED_ORIGINS = os.environ.get("ALLOWED_ORIGINS", "http://localhost:8001").split(",")
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+
+# Query cache settings
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "2000"))
+QUERY_CACHE_TTL = int(os.environ.get("QUERY_CACHE_TTL", "600"))
 
 # Data paths
 CSV_PATH = os.environ.get("CSV_PATH", "./data/gurbani_english_enhanced_chunks.csv")
 PDF_PATH = os.environ.get("PDF_PATH", "./data/guru_granth_sahib.pdf")
+# Persistent embedding cache (set to an empty string to disable)
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "./data/embedding_cache.sqlite")
 
 # Configure logging
 logging.basicConfig(
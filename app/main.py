@@ -7,50 +7,231 @@ This module implements the API endpoints for searching and retrieving
 information from the Guru Granth Sahib using semantic search.
 """
 
+import asyncio
+import hashlib
 import logging
 import os
-import traceback
+import re
+import time
+from contextlib import asynccontextmanager, suppress
+from pathlib import Path
 from typing import Dict, Any
-from fastapi import FastAPI, HTTPException, Request
+import httpx
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
 
-from app.config import CHROMA_DB_PATH, COLLECTION_NAME, PORT, HOST
-from app.models import SearchRequest, ChatRequest, ChatMessage, GenerateRequest
-from app.utils.search import search_similar_texts, expand_query
-from app.utils.response import format_results, format_results_with_llm
-from app.utils.embedding import get_best_available_model, get_available_models
+from app.config import (
+    ALLOWED_ORIGINS, COLLECTION_NAME, EMBEDDING_MODEL, OLLAMA_BASE_URL, OLLAMA_CONCURRENCY,
+    OLLAMA_EMBED_CONCURRENCY, OLLAMA_KEEP_ALIVE, OLLAMA_WARMUP, PORT, HOST, ENV,
+    WEB_CONCURRENCY, QUERY_CACHE_SIZE, QUERY_CACHE_TTL
+)
+from app.models import SearchRequest, ChatRequest, ChatMessage, ChatChoice, ChatResponse, GenerateRequest
+from app.utils.search import chroma_client, search_similar_texts, expand_query
+from app.utils.response import format_results, format_results_columnar, format_results_with_llm_async
+from app.utils.embedding import (
+    AsyncEmbeddingBatcher, get_available_models_async, get_best_available_model_async, get_fallback_embedding
+)
+from app.utils.query_cache import QueryCache, make_cache_key
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Words of 3+ letters, used to build a simpler fallback query
+_NOUN_RE = re.compile(r'\b[a-zA-Z]{3,}\b')
+
+# Cache of search results keyed on normalized query and top_k
+query_cache = QueryCache(max_size=QUERY_CACHE_SIZE, ttl_seconds=QUERY_CACHE_TTL)
+
+async def warm_up_ollama(http_client: httpx.AsyncClient):
+    """
+    Load the embedding and generation models into Ollama ahead of the first request.
+    
+    Args:
+        http_client (httpx.AsyncClient): Shared client for Ollama requests
+    """
+    try:
+        response = await http_client.get("/api/version", timeout=2)
+        if response.status_code != 200:
+            logger.warning("Ollama not ready (status %d), skipping model warmup", response.status_code)
+            return
+    except Exception as e:
+        logger.warning("Ollama not reachable, skipping model warmup: %s", e)
+        return
+    
+    try:
+        start = time.perf_counter()
+        await http_client.post(
+            "/api/embed",
+            json={"model": EMBEDDING_MODEL, "input": ["warmup"], "keep_alive": OLLAMA_KEEP_ALIVE},
+            timeout=120
+        )
+        logger.info("Warmed up embedding model %s in %.2fs", EMBEDDING_MODEL, time.perf_counter() - start)
+        
+        model = await get_best_available_model_async(http_client)
+        if model:
+            start = time.perf_counter()
+            # An empty prompt loads the model without generating anything
+            await http_client.post(
+                "/api/generate",
+                json={"model": model, "prompt": "", "keep_alive": OLLAMA_KEEP_ALIVE},
+                timeout=300
+            )
+            logger.info("Warmed up generation model %s in %.2fs", model, time.perf_counter() - start)
+    except Exception as e:
+        logger.warning("Ollama model warmup failed: %s", e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Set up shared resources on startup and release them on shutdown.
+    
+    The ChromaDB client and collection are opened once here and reused by
+    every request. If the collection does not exist or is empty, an
+    informative message about initializing the database is logged.
+    """
+    # Shared async HTTP client for Ollama calls made from request handlers,
+    # keeping connections alive across requests
+    app.state.http = httpx.AsyncClient(
+        base_url=OLLAMA_BASE_URL,
+        http2=True,
+        timeout=httpx.Timeout(30.0, connect=2.0),
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60)
+    )
+    # Cap in-flight Ollama requests per worker. Generation and embedding get
+    # separate limits so streamed answers never hold up query embeddings
+    app.state.llm_sem = asyncio.Semaphore(OLLAMA_CONCURRENCY)
+    app.state.embed_sem = asyncio.Semaphore(OLLAMA_EMBED_CONCURRENCY)
+    # Coalesce concurrent query embeddings into batched Ollama requests
+    app.state.embedding_batcher = AsyncEmbeddingBatcher(app.state.http, semaphore=app.state.embed_sem)
+    app.state.embedding_batcher.start()
+    # Reuse the ChromaDB client opened by the search module
+    app.state.chroma_client = chroma_client
+    app.state.collection = None
+    # Serve the UI from memory instead of reading the file per request
+    app.state.index_html = (Path(static_dir) / "index.html").read_bytes()
+    app.state.index_etag = f'"{hashlib.blake2b(app.state.index_html, digest_size=8).hexdigest()}"'
+    
+    try:
+        collection = app.state.chroma_client.get_collection(name=COLLECTION_NAME)
+        app.state.collection = collection
+        count = collection.count()
+        if count > 0:
+            logger.info("ChromaDB collection '%s' exists with %d documents", COLLECTION_NAME, count)
+        else:
+            logger.warning("ChromaDB collection '%s' exists but is empty", COLLECTION_NAME)
+            logger.info("To initialize the database, run: python -m app.process_data")
+    except Exception:
+        logger.warning("ChromaDB collection '%s' does not exist", COLLECTION_NAME)
+        logger.info("To initialize the database, run: python -m app.process_data")
+    
+    # Warm up in the background so a slow model load never delays serving
+    warmup_task = asyncio.create_task(warm_up_ollama(app.state.http)) if OLLAMA_WARMUP else None
+    
+    yield
+    
+    if warmup_task is not None:
+        warmup_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await warmup_task
+    await app.state.embedding_batcher.stop()
+    await app.state.http.aclose()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Gurbani Insight API",
     description="API for searching and retrieving wisdom from the Guru Granth Sahib",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=ALLOWED_ORIGINS,
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,
 )
 
+# Compress larger responses such as search results with full passages
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Determine the static files directory
 static_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
 
 # Mount static files directory
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
+def get_collection(request: Request):
+    """
+    Dependency returning the ChromaDB collection opened at startup.
+    
+    Returns:
+        Collection or None: The collection, or None if it did not exist at startup
+    """
+    return request.app.state.collection
+
+async def cached_search(query: str, top_k: int, collection=None):
+    """
+    Search for similar texts, serving repeated queries from the query cache.
+    
+    Args:
+        query (str): The search query
+        top_k (int): Number of results to return
+        collection: ChromaDB collection to search, if already open
+        
+    Returns:
+        list: Search results
+    """
+    key = make_cache_key(query, top_k)
+    results = query_cache.get(key)
+    if results is None:
+        query_embedding = await app.state.embedding_batcher.embed(query)
+        if query_embedding is None:
+            # Ollama is unavailable: search with a random embedding so the
+            # service keeps responding, but don't cache results unrelated to
+            # the query
+            return await asyncio.to_thread(
+                search_similar_texts, query, top_k, get_fallback_embedding(), collection
+            )
+        results = await asyncio.to_thread(search_similar_texts, query, top_k, query_embedding, collection)
+        # Don't cache empty results so transient search failures can recover
+        if results:
+            query_cache.put(key, results)
+    return results
+
+def _build_chat_response(model: str, content: str) -> Response:
+    """
+    Build an OpenAI-style chat completion response with a single assistant message.
+    
+    Args:
+        model (str): Model name echoed back to the client
+        content (str): Assistant message content
+        
+    Returns:
+        Response: JSON chat completion response
+    """
+    payload = ChatResponse(
+        id="chatcmpl-gurbani",
+        object="chat.completion",
+        created=int(time.time()),
+        model=model,
+        choices=[ChatChoice(message=ChatMessage(role="assistant", content=content))]
+    )
+    return Response(content=payload.model_dump_json(), media_type="application/json")
+
 # Serve the HTML interface
 @app.get("/", response_class=HTMLResponse)
-async def serve_ui():
+async def serve_ui(request: Request):
     """Serve the main HTML interface."""
-    return FileResponse(os.path.join(static_dir, "index.html"))
+    headers = {"Cache-Control": "public, max-age=300", "ETag": app.state.index_etag}
+    if request.headers.get("if-none-match") == app.state.index_etag:
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(content=app.state.index_html, headers=headers)
 
 @app.get("/health")
 async def health_check():
@@ -62,11 +243,10 @@ async def health_check():
     """
     try:
         # Check ChromaDB
-        import chromadb
-        client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-        
         try:
-            collection = client.get_collection(name=COLLECTION_NAME)
+            collection = app.state.collection
+            if collection is None:
+                collection = app.state.chroma_client.get_collection(name=COLLECTION_NAME)
             collection_count = collection.count()
             collection_status = f"Exists with {collection_count} documents"
         except Exception as e:
@@ -75,15 +255,11 @@ async def health_check():
             
         # Check Ollama
         try:
-            import requests
-            ollama_response = requests.get(
-                "http://localhost:11434/api/version",
-                timeout=2
-            )
+            ollama_response = await app.state.http.get("/api/version", timeout=2)
             ollama_status = "Connected" if ollama_response.status_code == 200 else "Error"
             
             # Get available models
-            models = get_available_models()
+            models = await get_available_models_async(app.state.http)
             ollama_models = ", ".join(models) if models else "None available"
         except Exception as e:
             ollama_status = f"Error: {str(e)}"
@@ -96,17 +272,18 @@ async def health_check():
             "chromadb_collection": collection_status,
             "documents": collection_count,
             "ollama": ollama_status,
-            "models": ollama_models
+            "models": ollama_models,
+            "query_cache": query_cache.stats()
         }
     except Exception as e:
-        logger.error(f"Health check error: {str(e)}")
+        logger.error("Health check error: %s", e)
         return {
             "status": "error",
             "message": str(e)
         }
 
 @app.post("/api/search")
-async def search(request: SearchRequest):
+async def search(request: SearchRequest, collection=Depends(get_collection)):
     """
     Search endpoint for finding relevant passages in the Guru Granth Sahib.
     
@@ -117,15 +294,21 @@ async def search(request: SearchRequest):
         dict: Search results and formatted response
     """
     try:
-        logger.info(f"Search request: {request.query} (top_k={request.top_k}, format={request.format})")
-        results = search_similar_texts(request.query, request.top_k)
-        return {"results": results, "formatted_response": format_results(results, request.format)}
+        logger.info("Search request: %s (top_k=%s, format=%s)", request.query, request.top_k, request.format)
+        results = await cached_search(request.query, request.top_k, collection)
+        if request.format == "columnar":
+            return {"results": format_results_columnar(results), "formatted_response": format_results(results)}
+        # Search hits are named tuples; serialize them as objects
+        return {
+            "results": [hit._asdict() for hit in results],
+            "formatted_response": format_results(results, request.format)
+        }
     except Exception as e:
-        logger.error(f"Search API error: {str(e)}\n{traceback.format_exc()}")
+        logger.error("Search API error: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/generate")
-async def generate(request: GenerateRequest):
+async def generate(request: GenerateRequest, collection=Depends(get_collection)):
     """
     Legacy endpoint for compatibility with older clients.
     
@@ -136,15 +319,15 @@ async def generate(request: GenerateRequest):
         dict: Generated response
     """
     try:
-        logger.info(f"Generate request: {request.prompt} (top_k={request.top_k})")
-        results = search_similar_texts(request.prompt, request.top_k)
+        logger.info("Generate request: %s (top_k=%s)", request.prompt, request.top_k)
+        results = await cached_search(request.prompt, request.top_k, collection)
         return {"response": format_results(results)}
     except Exception as e:
-        logger.error(f"Generate API error: {str(e)}\n{traceback.format_exc()}")
+        logger.error("Generate API error: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/v1/chat/completions")
-async def chat_completion(request: ChatRequest):
+async def chat_completion(request: ChatRequest, collection=Depends(get_collection)):
     """
     OpenAI-compatible chat completion API for better integration.
     
@@ -154,7 +337,7 @@ async def chat_completion(request: ChatRequest):
     Returns:
         dict: Chat completion response
     """
-    logger.info(f"Chat completion request with model: {request.model}")
+    logger.info("Chat completion request with model: %s", request.model)
     try:
         # Extract the last user message as the query
         user_messages = [msg for msg in request.messages if msg.role.lower() == "user"]
@@ -164,148 +347,96 @@ async def chat_completion(request: ChatRequest):
         
         # Get the original query
         original_query = user_messages[-1].content
-        logger.info(f"Original query: {original_query}")
-        
-        # Look for conversation context in previous messages
-        conversation_history = ""
-        if len(request.messages) > 1:
-            previous_messages = request.messages[:-1]
-            conversation_history = "\n".join([f"{msg.role}: {msg.content}" for msg in previous_messages[-3:]])
+        logger.info("Original query: %s", original_query)
         
         # Expand the query to improve semantic understanding
         expanded_query = expand_query(original_query)
-        logger.info(f"Expanded query: {expanded_query}")
+        logger.info("Expanded query: %s", expanded_query)
         
         # Determine optimal number of chunks to retrieve based on query complexity
         # Longer, more complex queries may need more sources
         words_in_query = len(original_query.split())
         base_k = request.top_k if request.top_k else 10
         
-        # Adjust retrieval count based on query length and complexity
-        if words_in_query > 15:
-            num_chunks = min(base_k + 5, 20)  # Get more chunks for complex queries, max 20
-        elif words_in_query < 5:
-            num_chunks = max(base_k - 3, 5)   # Fewer chunks for simple queries, min 5
-        else:
-            num_chunks = base_k
-            
-        logger.info(f"Retrieving {num_chunks} chunks for query with {words_in_query} words")
+        # Adjust retrieval count based on query length and complexity: more chunks
+        # for complex queries (max 20), fewer for simple queries (min 5)
+        num_chunks = (min(base_k + 5, 20) if words_in_query > 15
+                      else max(base_k - 3, 5) if words_in_query < 5
+                      else base_k)
+        
+        logger.info("Retrieving %d chunks for query with %d words", num_chunks, words_in_query)
         
         # Get search results with better error handling
         try:
-            # Try multiple search strategies if needed
-            results = search_similar_texts(expanded_query, num_chunks)
+            # Build a more focused query from just the key nouns
+            alternative_query = " ".join(_NOUN_RE.findall(original_query))
             
-            # If we didn't get good results, try a more focused search
+            # Run the alternative search alongside the primary one so a weak
+            # primary result doesn't cost a second sequential round-trip
+            if alternative_query and alternative_query != expanded_query:
+                results, alternative_results = await asyncio.gather(
+                    cached_search(expanded_query, num_chunks, collection),
+                    cached_search(alternative_query, num_chunks, collection)
+                )
+            else:
+                results = await cached_search(expanded_query, num_chunks, collection)
+                alternative_results = None
+            
+            # If we didn't get good results, use the more focused search
             if not results or len(results) < 3:
-                logger.warning(f"Initial search returned insufficient results ({len(results) if results else 0}). Trying alternative query.")
-                
-                # Try with just key nouns from the query
-                import re
-                nouns = re.findall(r'\b[a-zA-Z]{3,}\b', original_query)
-                alternative_query = " ".join(nouns)
+                logger.warning("Initial search returned insufficient results (%d). Trying alternative query.", len(results) if results else 0)
                 
-                if alternative_query and alternative_query != expanded_query:
-                    alternative_results = search_similar_texts(alternative_query, num_chunks)
-                    if alternative_results and len(alternative_results) > len(results):
-                        results = alternative_results
-                        logger.info(f"Alternative query found {len(results)} results")
+                if alternative_results and len(alternative_results) > len(results):
+                    results = alternative_results
+                    logger.info("Alternative query found %d results", len(results))
             
-            logger.info(f"Found {len(results)} results")
+            logger.info("Found %d results", len(results))
             
         except Exception as e:
-            logger.error(f"Search error: {str(e)}\n{traceback.format_exc()}")
+            logger.error("Search error: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
             # Return a fallback response
-            return {
-                "id": "chatcmpl-gurbani",
-                "object": "chat.completion",
-                "created": 1700,
-                "model": request.model,
-                "choices": [{
-                    "index": 0,
-                    "message": {
-                        "role": "assistant",
-                        "content": "I apologize, but I encountered an issue while searching the Guru Granth Sahib. The wisdom teaches us that patience and perseverance lead to spiritual growth. Please try your question again in a moment."
-                    },
-                    "finish_reason": "stop"
-                }]
-            }
+            return _build_chat_response(
+                request.model,
+                "I apologize, but I encountered an issue while searching the Guru Granth Sahib. The wisdom teaches us that patience and perseverance lead to spiritual growth. Please try your question again in a moment."
+            )
         
         if not results:
             logger.warning("No results found for query")
-            return {
-                "id": "chatcmpl-gurbani",
-                "object": "chat.completion",
-                "created": 1700,
-                "model": request.model,
-                "choices": [{
-                    "index": 0,
-                    "message": {
-                        "role": "assistant",
-                        "content": "I couldn't find specific passages in the Guru Granth Sahib that address your question about " + 
-                            original_query.lower() + ". Perhaps you could try rephrasing your question or asking about a related aspect of Sikh teachings?"
-                    },
-                    "finish_reason": "stop"
-                }]
-            }
+            return _build_chat_response(
+                request.model,
+                "I couldn't find specific passages in the Guru Granth Sahib that address your question about " + 
+                    original_query.lower() + ". Perhaps you could try rephrasing your question or asking about a related aspect of Sikh teachings?"
+            )
         
         # Log the first result to help with debugging
         if results:
-            logger.info(f"Top result - Section: {results[0]['section']}, Ang: {results[0]['ang_number']}")
-            logger.info(f"Text snippet: {results[0]['text'][:100]}...")
+            logger.info("Top result - Section: %s, Ang: %s", results[0].section, results[0].ang_number)
+            logger.info("Text snippet: %.100s...", results[0].text)
         
         # Use the enhanced response generation with the original query for context
-        response = format_results_with_llm(original_query, results)
-        logger.info(f"Generated response of length {len(response)}")
+        response = await format_results_with_llm_async(
+            original_query, results, app.state.http, semaphore=app.state.llm_sem
+        )
+        logger.info("Generated response of length %d", len(response))
         
-        return {
-            "id": "chatcmpl-gurbani",
-            "object": "chat.completion",
-            "created": 1700,
-            "model": request.model,
-            "choices": [{
-                "index": 0,
-                "message": {
-                    "role": "assistant",
-                    "content": response
-                },
-                "finish_reason": "stop"
-            }]
-        }
+        return _build_chat_response(request.model, response)
     except Exception as e:
-        logger.error(f"Chat completion error: {str(e)}\n{traceback.format_exc()}")
+        logger.error("Chat completion error: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
         raise HTTPException(status_code=500, detail=str(e))
 
-# Initialize database on startup
-@app.on_event("startup")
-async def startup_event():
-    """
-    Initialize the database on application startup.
-    
-    This function checks if the ChromaDB collection exists and has data.
-    If not, it logs an informative message about initializing the database.
-    """
-    try:
-        import chromadb
-        client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-        
-        try:
-            collection = client.get_collection(name=COLLECTION_NAME)
-            count = collection.count()
-            if count > 0:
-                logger.info(f"ChromaDB collection '{COLLECTION_NAME}' exists with {count} documents")
-            else:
-                logger.warning(f"ChromaDB collection '{COLLECTION_NAME}' exists but is empty")
-                logger.info("To initialize the database, run: python -m app.process_data")
-        except Exception:
-            logger.warning(f"ChromaDB collection '{COLLECTION_NAME}' does not exist")
-            logger.info("To initialize the database, run: python -m app.process_data")
-            
-    except Exception as e:
-        logger.error(f"Error connecting to ChromaDB: {str(e)}")
-
-
 # Script entrypoint for running with Python directly
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app.main:app", host=HOST, port=PORT, reload=True)
\ No newline at end of file
+    if ENV == "dev":
+        uvicorn.run("app.main:app", host=HOST, port=PORT, reload=True)
+    else:
+        # Each worker holds its own query cache and ChromaDB client
+        uvicorn.run(
+            "app.main:app",
+            host=HOST,
+            port=PORT,
+            workers=WEB_CONCURRENCY,
+            loop="uvloop",
+            http="httptools",
+            access_log=False
+        )
\ No newline at end of file
@@ -6,25 +6,41 @@ Data models for the Gurbani Insight application.
 Defines Pydantic models for API requests and responses.
 """
 
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field
+from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class SearchRequest(BaseModel):
     """Request model for basic search functionality."""
+    model_config = ConfigDict(extra="ignore")
+
     query: str
     top_k: int = Field(default=3, description="Number of results to return")
-    format: str = Field(default="default", description="Format type (default, chat, summary, paragraph)")
+    format: str = Field(
+        default="default",
+        description=(
+            "Format type (default, chat, summary, paragraph, columnar). With 'columnar', "
+            "results are returned as parallel lists (scores, texts, ang_numbers, sections, "
+            "raags, page_nums) instead of one object per result; entry i of every list "
+            "belongs to the same result. This avoids repeating the field names per result "
+            "and lets clients load a column such as scores straight into an array, but "
+            "clients must zip the lists to rebuild individual results."
+        )
+    )
 
 
 class ChatMessage(BaseModel):
     """Model for a single chat message."""
+    model_config = ConfigDict(extra="ignore")
+
     role: str
     content: str
 
 
 class ChatRequest(BaseModel):
     """Request model for chat completion API."""
+    model_config = ConfigDict(extra="ignore")
+
     messages: List[ChatMessage]
     model: str = Field(default="gurbani-search", description="Model to use for completion")
     top_k: int = Field(default=10, description="Number of passages to retrieve")
@@ -32,12 +48,16 @@ class ChatRequest(BaseModel):
 
 class GenerateRequest(BaseModel):
     """Legacy request model for compatibility with older clients."""
+    model_config = ConfigDict(extra="ignore")
+
     prompt: str
     top_k: int = Field(default=3, description="Number of results to return")
 
 
 class SearchResult(BaseModel):
     """Model for a single search result."""
+    model_config = ConfigDict(extra="ignore")
+
     score: float
     text: str
     ang_number: int
@@ -48,14 +68,27 @@ class SearchResult(BaseModel):
 
 class SearchResponse(BaseModel):
     """Response model for search API."""
+    model_config = ConfigDict(extra="ignore")
+
     results: List[SearchResult]
     formatted_response: str
 
 
+class ChatChoice(BaseModel):
+    """Model for a single choice in a chat completion response."""
+    model_config = ConfigDict(extra="ignore")
+
+    index: int = 0
+    message: ChatMessage
+    finish_reason: str = "stop"
+
+
 class ChatResponse(BaseModel):
     """Response model for chat completion API."""
+    model_config = ConfigDict(extra="ignore")
+
     id: str
     object: str
     created: int
     model: str
-    choices: List[Dict[str, Any]]
\ No newline at end of file
+    choices: List[ChatChoice]
\ No newline at end of file
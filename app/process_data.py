@@ -6,18 +6,101 @@ Data processing script for the Gurbani Insight application.
 Processes the Guru Granth Sahib PDF, extracts text, and stores it in ChromaDB.
 """
 
+import asyncio
+import csv
 import os
 import re
+import multiprocessing
+from contextlib import closing
+from collections import deque
+from itertools import islice
 import pandas as pd
 from tqdm import tqdm
 import pypdf
 import logging
+try:
+    import fitz  # PyMuPDF, a much faster C-backed extractor
+except ImportError:
+    fitz = None
 import chromadb
+import httpx
 from app.config import CHROMA_DB_PATH, COLLECTION_NAME, PDF_PATH, CSV_PATH
-from app.utils.embedding import get_embedding
+from app.utils.embedding import get_embeddings_async
 
 logger = logging.getLogger(__name__)
 
+# Patterns used while parsing PDF text, compiled once at import
+_RAAG_PATTERNS = [
+    re.compile(r'Raag[u]?\s+([A-Za-z\s]+)'),
+    re.compile(r'rwgu\s+([A-Za-z\s]+)')
+]
+# Ang markers in priority order: standard Gurmukhi, alternative spelling,
+# English, direct English
+_ANG_MARKERS = ('pMnw', 'AMg', 'Ang', 'Page')
+_ANG = re.compile(r'(?P<marker>pMnw|AMg|Ang|Page)\s*(?P<number>\d+)')
+_WS = re.compile(r'\s+')
+_DIGIT = re.compile(r'\d')
+# Parenthesized asides and ||verse numbers||, removed in a single pass
+_DROP = re.compile(r'\([^)]*\)|\|\|.*?\|\|')
+# Deletes every Gurmukhi code point when passed to str.translate
+_GURMUKHI_TABLE = dict.fromkeys(range(0x0A00, 0x0A80))
+# A run of Gurmukhi up to the next ']', which closes the Gurmukhi part of a line
+_GURMUKHI_SEGMENT = re.compile(r'[\u0A00-\u0A7F]+.*?]')
+_ENG_SENT = re.compile(r'[A-Z][^.!?]*[.!?]')
+_STARTS_UPPER = re.compile(r'^[A-Z]')
+
+# Distinctive phrases of the Mool Mantar (matched case-sensitively)
+_MOOL_MANTAR_INDICATORS = [
+    "One Universal Creator God",
+    "The Name Is Truth",
+    "Creative Being Personified",
+    "No Fear. No Hatred"
+]
+
+# Sections with their lowercase indicators, in order of precedence
+_SECTIONS = {
+    'japji': {
+        'name': 'Japji Sahib',
+        'indicators': ['japji', 'listening-truth', 'by the karma of past actions']
+    },
+    'jaap': {
+        'name': 'Jaap Sahib',
+        'indicators': ['jaap sahib', 'infinite destroyer']
+    },
+    'rehras': {
+        'name': 'Rehras Sahib',
+        'indicators': ['rehras', 'evening prayers']
+    },
+    'anand': {
+        'name': 'Anand Sahib',
+        'indicators': ['anand sahib', 'song of bliss']
+    },
+    'asa_di_var': {
+        'name': 'Asa Di Var',
+        'indicators': ['asa di var', 'ballad of asa']
+    },
+    'sukhmani': {
+        'name': 'Sukhmani Sahib',
+        'indicators': ['sukhmani', 'pearl of peace']
+    }
+}
+
+# Markers of header and metadata lines that clean_text skips
+_SKIP_LINE_MARKERS = ["pMnw", "Phonetic", "Transliteration by:", "************************", "||"]
+
+# Each keyword list is compiled into one alternation so a text is scanned
+# once rather than once per keyword
+_MOOL_MANTAR_RE = re.compile('|'.join(map(re.escape, _MOOL_MANTAR_INDICATORS)))
+_SECTION_BY_INDICATOR = {
+    indicator: info['name'] for info in _SECTIONS.values() for indicator in info['indicators']
+}
+_SECTION_PRIORITY = {info['name']: i for i, info in enumerate(_SECTIONS.values())}
+_SECTION_RE = re.compile('|'.join(map(re.escape, _SECTION_BY_INDICATOR)))
+_SKIP_LINE_RE = re.compile('|'.join(map(re.escape, _SKIP_LINE_MARKERS)))
+
+# Embedding requests are I/O bound, so keep several in flight at once
+_EMBEDDING_CONCURRENCY = 8
+
 
 def identify_raag(text):
     """
@@ -29,16 +112,11 @@ def identify_raag(text):
     Returns:
         str or None: Identified raag name, or None if not found
     """
-    raag_patterns = [
-        r'Raag[u]?\s+([A-Za-z\s]+)',
-        r'rwgu\s+([A-Za-z\s]+)'
-    ]
-    
-    for pattern in raag_patterns:
-        match = re.search(pattern, text)
+    for pattern in _RAAG_PATTERNS:
+        match = pattern.search(text)
         if match:
             raag = match.group(1).strip()
-            raag = re.sub(r'\s+', ' ', raag)
+            raag = _WS.sub(' ', raag)
             return raag
     return None
 
@@ -54,48 +132,13 @@ def identify_section(text):
         str or None: Identified section name, or None if not found
     """
     # First, check for Mool Mantar by its distinctive phrases
-    mool_mantar_indicators = [
-        "One Universal Creator God",
-        "The Name Is Truth",
-        "Creative Being Personified",
-        "No Fear. No Hatred"
-    ]
-    
-    if any(indicator in text for indicator in mool_mantar_indicators):
+    if _MOOL_MANTAR_RE.search(text):
         return "Mool Mantar"
     
-    # Define sections with their indicators
-    sections = {
-        'japji': {
-            'name': 'Japji Sahib',
-            'indicators': ['japji', 'listening-truth', 'by the karma of past actions']
-        },
-        'jaap': {
-            'name': 'Jaap Sahib',
-            'indicators': ['jaap sahib', 'infinite destroyer']
-        },
-        'rehras': {
-            'name': 'Rehras Sahib',
-            'indicators': ['rehras', 'evening prayers']
-        },
-        'anand': {
-            'name': 'Anand Sahib',
-            'indicators': ['anand sahib', 'song of bliss']
-        },
-        'asa_di_var': {
-            'name': 'Asa Di Var',
-            'indicators': ['asa di var', 'ballad of asa']
-        },
-        'sukhmani': {
-            'name': 'Sukhmani Sahib',
-            'indicators': ['sukhmani', 'pearl of peace']
-        }
-    }
-    
-    lower_text = text.lower()
-    for section_info in sections.values():
-        if any(indicator in lower_text for indicator in section_info['indicators']):
-            return section_info['name']
+    # Several sections may match; the earliest one in _SECTIONS wins
+    matched = {_SECTION_BY_INDICATOR[m] for m in _SECTION_RE.findall(text.lower())}
+    if matched:
+        return min(matched, key=_SECTION_PRIORITY.__getitem__)
     
     return None
 
@@ -117,18 +160,19 @@ def extract_ang_number(text, page_num):
             return 1
         return None
     
-    # Regular Ang number extraction
-    patterns = [
-        r'pMnw\s*(\d+)',  # Standard Gurmukhi
-        r'AMg\s*(\d+)',   # Alternative spelling
-        r'Ang\s*(\d+)',   # English
-        r'Page\s*(\d+)'   # Direct English
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text)
-        if match:
-            ang_num = int(match.group(1))
+    # Regular Ang number extraction, in a single scan of the text; only the
+    # first occurrence of each marker counts
+    first_numbers = {}
+    for match in _ANG.finditer(text):
+        first_numbers.setdefault(match.group('marker'), match.group('number'))
+        if len(first_numbers) == len(_ANG_MARKERS):
+            break
+    
+    # Markers are tried in priority order, not in order of appearance
+    for marker in _ANG_MARKERS:
+        number = first_numbers.get(marker)
+        if number is not None:
+            ang_num = int(number)
             # Validate Ang number (adjust range as needed)
             if 1 <= ang_num <= 1430:
                 return ang_num
@@ -158,6 +202,19 @@ def clean_text_with_context(text, page_num):
     return cleaned_text, context
 
 
+def has_gurmukhi(line):
+    """
+    Check whether a line contains any Gurmukhi characters.
+    
+    Args:
+        line (str): Line of text to check
+        
+    Returns:
+        bool: True if the line contains Gurmukhi script
+    """
+    return len(line.translate(_GURMUKHI_TABLE)) != len(line)
+
+
 def extract_english_translation(line):
     """
     Extract only the English translation from a line of text.
@@ -169,15 +226,18 @@ def extract_english_translation(line):
         str: Extracted English translation, or empty string if not found
     """
     # Skip lines containing Gurmukhi script
-    if re.search(r'[\u0A00-\u0A7F]', line):
-        parts = re.split(r'[\u0A00-\u0A7F]+.*?]', line)
-        if len(parts) > 1:
-            line = parts[-1]
-        else:
+    # Keep only the text after the last Gurmukhi segment, without building
+    # the list of all the pieces around it
+    if has_gurmukhi(line):
+        last = None
+        for last in _GURMUKHI_SEGMENT.finditer(line):
+            pass
+        if last is None:
             return ""
+        line = line[last.end():]
 
     # Look for English text that starts with capital letter
-    matches = re.findall(r'[A-Z][^.!?]*[.!?]', line)
+    matches = _ENG_SENT.findall(line)
     
     if matches:
         # Join complete English sentences
@@ -186,7 +246,7 @@ def extract_english_translation(line):
     # Alternative: look for English after common separators
     if ']' in line:
         parts = line.split(']')
-        if len(parts) > 1 and re.match(r'^[A-Z]', parts[-1].strip()):
+        if len(parts) > 1 and _STARTS_UPPER.match(parts[-1].strip()):
             return parts[-1].strip()
     
     return ""
@@ -210,40 +270,179 @@ def clean_text(text):
     
     for line in lines:
         # Skip header and metadata lines
-        if any(x in line for x in ["pMnw", "Phonetic", "Transliteration by:", "************************", "||"]):
+        if _SKIP_LINE_RE.search(line):
             continue
             
         # Get English translation
         english_part = extract_english_translation(line)
         if english_part:
-            # Additional cleaning
-            english_part = re.sub(r'\([^)]*\)', '', english_part)  # Remove parentheses
-            english_part = re.sub(r'\|\|.*?\|\|', '', english_part)  # Remove verse numbers
-            english_part = re.sub(r'\s+', ' ', english_part)  # Normalize whitespace
-            english_part = english_part.strip()
+            # Additional cleaning: drop parentheses and verse numbers, then
+            # normalize whitespace
+            english_part = _WS.sub(' ', _DROP.sub('', english_part)).strip()
             
             # Verify it's a proper English sentence
             if (len(english_part.split()) > 2 and  # At least 3 words
                 english_part[0].isupper() and      # Starts with capital letter
-                not any(char.isdigit() for char in english_part)):  # No numbers
+                not _DIGIT.search(english_part)):  # No numbers
                 english_translations.append(english_part)
     
     return ' '.join(english_translations)
 
 
-def preprocess_gurbani_pdf(pdf_path):
+# Column order of the processed chunks CSV
+_CSV_FIELDS = ['id', 'text', 'page_num', 'ang_number', 'raag', 'section', 'prev_chunk_id', 'next_chunk_id']
+
+# ChromaDB metadata fields with the defaults stored for missing values,
+# and the type each field is stored as
+_METADATA_DEFAULTS = {
+    'ang_number': 0,
+    'section': "Unknown",
+    'raag': "",
+    'prev_chunk_id': -1,
+    'next_chunk_id': -1
+}
+_METADATA_DTYPES = {
+    'ang_number': int,
+    'section': str,
+    'raag': str,
+    'page_num': int,
+    'prev_chunk_id': int,
+    'next_chunk_id': int
+}
+
+# PDF document opened once in each page extraction worker process
+_worker_pdf = None
+
+
+def open_pdf(pdf_path):
     """
-    Enhanced preprocessing with contextual information.
+    Open a PDF with PyMuPDF when installed, falling back to pypdf.
     
     Args:
         pdf_path (str): Path to the PDF file
         
     Returns:
-        list: List of chunks with metadata
+        fitz.Document or pypdf.PdfReader: The opened document
+    """
+    if fitz is not None:
+        return fitz.open(pdf_path)
+    return pypdf.PdfReader(pdf_path)
+
+
+def close_pdf(pdf):
+    """
+    Close a document returned by open_pdf.
+    
+    Args:
+        pdf: Document returned by open_pdf
+    """
+    # pypdf reads the whole file into memory, so only PyMuPDF holds it open
+    if fitz is not None:
+        pdf.close()
+
+
+def get_page_count(pdf):
+    """
+    Get the number of pages in a document returned by open_pdf.
+    
+    Args:
+        pdf: Document returned by open_pdf
+        
+    Returns:
+        int: Number of pages
+    """
+    if fitz is not None:
+        return pdf.page_count
+    return len(pdf.pages)
+
+
+def get_page_text(pdf, page_num):
+    """
+    Extract the text of a page from a document returned by open_pdf.
+    
+    Args:
+        pdf: Document returned by open_pdf
+        page_num (int): Zero-based page index
+        
+    Returns:
+        str: Extracted page text
+    """
+    if fitz is not None:
+        return pdf.load_page(page_num).get_text("text")
+    return pdf.pages[page_num].extract_text()
+
+
+def _init_page_worker(pdf_path):
+    """
+    Open the PDF in a page extraction worker process.
+    
+    Args:
+        pdf_path (str): Path to the PDF file
+    """
+    global _worker_pdf
+    _worker_pdf = open_pdf(pdf_path)
+
+
+def _extract_page_text(page_num):
+    """
+    Extract the text of a single page in a worker process.
+    
+    Args:
+        page_num (int): Zero-based page index
+        
+    Returns:
+        tuple: (page_num, extracted text)
+    """
+    return page_num, get_page_text(_worker_pdf, page_num)
+
+
+def iter_page_texts(pdf_path, start_page=1):
+    """
+    Extract page texts in parallel, yielding them in page order.
+    
+    Args:
+        pdf_path (str): Path to the PDF file
+        start_page (int): Zero-based index of the first page to extract
+        
+    Yields:
+        tuple: (page_num, extracted text)
+    """
+    pdf = open_pdf(pdf_path)
+    try:
+        num_pages = get_page_count(pdf)
+    finally:
+        close_pdf(pdf)
+    
+    # Pages are pulled from a worker thread while the ingestion event loop
+    # runs, and forking a multi-threaded process can deadlock, so start the
+    # workers with spawn instead
+    spawn = multiprocessing.get_context("spawn")
+    with spawn.Pool(initializer=_init_page_worker, initargs=(pdf_path,)) as pool:
+        yield from tqdm(
+            pool.imap(_extract_page_text, range(start_page, num_pages), chunksize=16),
+            total=max(num_pages - start_page, 0),
+            desc="Processing pages"
+        )
+
+
+def iter_gurbani_pdf_chunks(pdf_path):
+    """
+    Enhanced preprocessing with contextual information, yielding chunks as
+    they are assembled.
+    
+    Args:
+        pdf_path (str): Path to the PDF file
+        
+    Yields:
+        dict: Chunk with metadata
+    
+    Notes:
+        Each chunk is held back until the next one exists, so its
+        next_chunk_id is final when it is yielded (None for the last chunk).
     """
-    logger.info(f"Processing PDF: {pdf_path}")
-    pdf_reader = pypdf.PdfReader(pdf_path)
-    chunks = []
+    logger.info(f"Processing PDF: {pdf_path} (backend: {'pymupdf' if fitz is not None else 'pypdf'})")
+    pending = None
+    chunk_count = 0
     current_chunk = []
     current_length = 0
     target_chunk_size = 200
@@ -255,13 +454,22 @@ def preprocess_gurbani_pdf(pdf_path):
         'section': None
     }
     
-    # Skip first page (contains header information)
-    for page_num in tqdm(range(1, len(pdf_reader.pages)), desc="Processing pages"):
-        page = pdf_reader.pages[page_num]
-        text = page.extract_text()
-        
-        blocks = text.split('\n\n')
-        for block in blocks:
+    def make_chunk(chunk_text, page_num):
+        return {
+            'id': chunk_count,
+            'text': chunk_text,
+            'page_num': page_num + 1,
+            'ang_number': current_context['ang_number'],
+            'raag': current_context['raag'],
+            'section': current_context['section'],
+            'prev_chunk_id': chunk_count - 1 if chunk_count > 0 else None,
+            'next_chunk_id': None  # Set once the following chunk exists
+        }
+    
+    # Skip first page (contains header information); pages are extracted
+    # in parallel but arrive in order, so context tracking is unchanged
+    for page_num, text in iter_page_texts(pdf_path, start_page=1):
+        for block in text.split('\n\n'):
             # Pass page_num to clean_text_with_context
             cleaned_text, block_context = clean_text_with_context(block, page_num)
             
@@ -269,47 +477,173 @@ def preprocess_gurbani_pdf(pdf_path):
             current_context.update({k: v for k, v in block_context.items() if v is not None})
             
             if cleaned_text:
-                words = cleaned_text.split()
-                current_chunk.extend(words)
-                current_length += len(words)
+                # Buffer whole cleaned strings and join once per chunk;
+                # clean_text leaves single spaces, so spaces count words
+                current_chunk.append(cleaned_text)
+                current_length += cleaned_text.count(' ') + 1
                 
                 if current_length >= target_chunk_size:
-                    chunk_text = ' '.join(current_chunk)
-                    if len(chunk_text.split()) > 50:  # Ensure minimum chunk size
-                        chunks.append({
-                            'id': len(chunks),
-                            'text': chunk_text,
-                            'page_num': page_num + 1,
-                            'ang_number': current_context['ang_number'],
-                            'raag': current_context['raag'],
-                            'section': current_context['section'],
-                            'prev_chunk_id': len(chunks) - 1 if len(chunks) > 0 else None,
-                            'next_chunk_id': len(chunks) + 1  # Will be updated for last chunk
-                        })
+                    if current_length > 50:  # Ensure minimum chunk size
+                        chunk = make_chunk(' '.join(current_chunk), page_num)
+                        if pending is not None:
+                            pending['next_chunk_id'] = chunk['id']
+                            yield pending
+                        pending = chunk
+                        chunk_count += 1
                     current_chunk = []
                     current_length = 0
     
     # Add any remaining content
-    if current_chunk:
-        chunk_text = ' '.join(current_chunk)
-        if len(chunk_text.split()) > 50:
-            chunks.append({
-                'id': len(chunks),
-                'text': chunk_text,
-                'page_num': page_num + 1,
-                'ang_number': current_context['ang_number'],
-                'raag': current_context['raag'],
-                'section': current_context['section'],
-                'prev_chunk_id': len(chunks) - 1 if len(chunks) > 0 else None,
-                'next_chunk_id': None
-            })
-    
-    # Fix next_chunk_id for last chunk
-    if chunks:
-        chunks[-1]['next_chunk_id'] = None
-    
-    logger.info(f"Generated {len(chunks)} chunks from PDF")
-    return chunks
+    if current_chunk and current_length > 50:
+        chunk = make_chunk(' '.join(current_chunk), page_num)
+        if pending is not None:
+            pending['next_chunk_id'] = chunk['id']
+            yield pending
+        pending = chunk
+        chunk_count += 1
+    
+    if pending is not None:
+        yield pending
+    
+    logger.info(f"Generated {chunk_count} chunks from PDF")
+
+
+def preprocess_gurbani_pdf(pdf_path):
+    """
+    Enhanced preprocessing with contextual information.
+    
+    Args:
+        pdf_path (str): Path to the PDF file
+        
+    Returns:
+        list: List of chunks with metadata
+    """
+    return list(iter_gurbani_pdf_chunks(pdf_path))
+
+
+def iter_batches(items, batch_size):
+    """
+    Group an iterable into lists of at most batch_size items.
+    
+    Args:
+        items (iterable): Items to group
+        batch_size (int): Maximum number of items per batch
+        
+    Yields:
+        list: The next batch of items
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+async def _aiter_embedded_batches(batches, max_pending=16):
+    """
+    Embed batches concurrently on one event loop while they are produced.
+    
+    Args:
+        batches (iterator): Batches of chunks; advanced in a worker thread so
+            PDF extraction and CSV writing do not block in-flight requests
+        max_pending (int): Maximum number of batches embedded or waiting
+            at once, bounding memory use
+        
+    Yields:
+        tuple: (batch, embeddings), in batch order
+    """
+    semaphore = asyncio.Semaphore(_EMBEDDING_CONCURRENCY)
+    pending = deque()
+    async with httpx.AsyncClient() as http_client:
+        while True:
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+            texts = [chunk['text'] for chunk in batch]
+            pending.append((batch, asyncio.create_task(get_embeddings_async(texts, http_client, semaphore))))
+            if len(pending) >= max_pending:
+                batch, task = pending.popleft()
+                yield batch, await task
+        while pending:
+            batch, task = pending.popleft()
+            yield batch, await task
+
+
+def _add_batch_to_collection(collection, batch, batch_embeddings):
+    """
+    Add one embedded batch of chunks to a ChromaDB collection.
+    
+    Args:
+        collection: ChromaDB collection
+        batch (list): Chunks in the batch
+        batch_embeddings (list): Embeddings, in the same order as the chunks
+        
+    Returns:
+        int: Number of chunks added
+    """
+    # Build all metadata for the batch in one vectorized pass, filling the
+    # same defaults for missing values as before
+    try:
+        meta_df = (
+            pd.DataFrame(batch, columns=list(_METADATA_DEFAULTS) + ['page_num'])
+            .fillna(_METADATA_DEFAULTS)
+            .astype(_METADATA_DTYPES)
+        )
+        metadatas = meta_df.to_dict(orient='records')
+    except Exception as e:
+        logger.error(f"Error building metadata for batch starting at chunk {batch[0]['id']}: {str(e)}")
+        return 0
+    
+    ids = []
+    embeddings = []
+    kept_metadatas = []
+    documents = []
+    
+    # Skip chunks whose embedding has the wrong dimension, which would
+    # otherwise fail the whole batch's add() call
+    dim = len(batch_embeddings[0]) if batch_embeddings else 0
+    
+    for chunk, metadata, embedding in zip(batch, metadatas, batch_embeddings):
+        if len(embedding) != dim:
+            logger.error(f"Error processing chunk {chunk['id']}: embedding has {len(embedding)} dimensions, expected {dim}")
+            continue
+        ids.append(str(chunk['id']))
+        embeddings.append(embedding)
+        kept_metadatas.append(metadata)
+        documents.append(chunk['text'])
+    
+    # Add batch to collection
+    if ids:
+        collection.add(
+            ids=ids,
+            embeddings=embeddings,
+            metadatas=kept_metadatas,
+            documents=documents
+        )
+    return len(ids)
+
+
+async def _load_batches_async(collection, batches):
+    """
+    Embed batches asynchronously and add them to a collection in order.
+    
+    Args:
+        collection: ChromaDB collection
+        batches (iterator): Batches of chunks
+        
+    Returns:
+        int: Number of chunks loaded
+    """
+    total = 0
+    batch_num = 0
+    with tqdm(desc="Loading chunks to ChromaDB") as progress:
+        async for batch, batch_embeddings in _aiter_embedded_batches(batches):
+            total += await asyncio.to_thread(_add_batch_to_collection, collection, batch, batch_embeddings)
+            batch_num += 1
+            progress.update()
+            logger.info(f"Added batch {batch_num} to ChromaDB")
+    return total
 
 
 def load_chunks_to_chromadb(chunks):
@@ -317,7 +651,8 @@ def load_chunks_to_chromadb(chunks):
     Load chunks into ChromaDB.
     
     Args:
-        chunks (list): List of chunks to load
+        chunks (iterable): Chunks to load; a generator is consumed lazily,
+            one batch at a time
         
     Returns:
         bool: True if successful, False otherwise
@@ -340,48 +675,12 @@ def load_chunks_to_chromadb(chunks):
         collection = client.create_collection(name=COLLECTION_NAME)
         logger.info(f"Created collection '{COLLECTION_NAME}'")
         
-        # Process chunks in batches
-        batch_size = 50
-        for i in tqdm(range(0, len(chunks), batch_size), desc="Loading chunks to ChromaDB"):
-            batch = chunks[i:i + batch_size]
-            
-            ids = []
-            embeddings = []
-            metadatas = []
-            documents = []
-            
-            for chunk in batch:
-                # Generate embedding
-                try:
-                    embedding = get_embedding(chunk['text'])
-                    
-                    # Add to batch
-                    ids.append(str(chunk['id']))
-                    embeddings.append(embedding)
-                    metadatas.append({
-                        'ang_number': int(chunk['ang_number']) if chunk['ang_number'] is not None else 0,
-                        'section': str(chunk['section']) if chunk['section'] is not None else "Unknown",
-                        'raag': str(chunk['raag']) if chunk['raag'] is not None else "",
-                        'page_num': int(chunk['page_num']),
-                        'prev_chunk_id': int(chunk['prev_chunk_id']) if chunk['prev_chunk_id'] is not None else -1,
-                        'next_chunk_id': int(chunk['next_chunk_id']) if chunk['next_chunk_id'] is not None else -1
-                    })
-                    documents.append(chunk['text'])
-                except Exception as e:
-                    logger.error(f"Error processing chunk {chunk['id']}: {str(e)}")
-                    continue
-            
-            # Add batch to collection
-            if ids:
-                collection.add(
-                    ids=ids,
-                    embeddings=embeddings,
-                    metadatas=metadatas,
-                    documents=documents
-                )
-                logger.info(f"Added batch {i//batch_size + 1}/{(len(chunks)-1)//batch_size + 1} to ChromaDB")
+        # Process chunks in batches, embedding each batch with one request;
+        # several batches are embedded concurrently and added in order
+        batch_size = 128
+        total = asyncio.run(_load_batches_async(collection, iter_batches(chunks, batch_size)))
         
-        logger.info(f"Successfully loaded {len(chunks)} chunks to ChromaDB")
+        logger.info(f"Successfully loaded {total} chunks to ChromaDB")
         return True
     except Exception as e:
         logger.error(f"Error loading chunks to ChromaDB: {str(e)}")
@@ -400,8 +699,11 @@ def save_chunks_to_csv(chunks, csv_path):
         bool: True if successful, False otherwise
     """
     try:
-        df = pd.DataFrame(chunks)
-        df.to_csv(csv_path, index=False)
+        # Stream rows straight to disk instead of building a DataFrame copy
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=_CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(chunks)
         logger.info(f"Saved {len(chunks)} chunks to {csv_path}")
         return True
     except Exception as e:
@@ -409,6 +711,41 @@ def save_chunks_to_csv(chunks, csv_path):
         return False
 
 
+def iter_chunks_through_csv(chunks, csv_path):
+    """
+    Pass chunks through unchanged while writing each one to a CSV file.
+    
+    Args:
+        chunks (iterable): Chunks to write
+        csv_path (str): Path to save CSV file
+        
+    Yields:
+        dict: The same chunks, after each has been written
+    
+    Notes:
+        Rows go to a temporary file that only replaces csv_path once every
+        chunk has been written, so an interrupted run never leaves a partial
+        CSV that a later run would load as complete.
+    """
+    tmp_path = f"{csv_path}.tmp"
+    completed = False
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=_CSV_FIELDS)
+            writer.writeheader()
+            count = 0
+            for chunk in chunks:
+                writer.writerow(chunk)
+                count += 1
+                yield chunk
+        os.replace(tmp_path, csv_path)
+        completed = True
+        logger.info(f"Saved {count} chunks to {csv_path}")
+    finally:
+        if not completed and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
 def load_data_from_csv(csv_path):
     """
     Load data from CSV file into ChromaDB.
@@ -424,19 +761,12 @@ def load_data_from_csv(csv_path):
         df = pd.read_csv(csv_path)
         logger.info(f"Loaded {len(df)} records from CSV")
         
-        # Convert DataFrame to chunks format
-        chunks = []
-        for _, row in df.iterrows():
-            chunks.append({
-                'id': int(row['id']),
-                'text': row['text'],
-                'page_num': int(row['page_num']),
-                'ang_number': int(row['ang_number']) if not pd.isna(row['ang_number']) else None,
-                'raag': row['raag'] if not pd.isna(row['raag']) else None,
-                'section': row['section'] if not pd.isna(row['section']) else None,
-                'prev_chunk_id': int(row['prev_chunk_id']) if not pd.isna(row['prev_chunk_id']) else None,
-                'next_chunk_id': int(row['next_chunk_id']) if not pd.isna(row['next_chunk_id']) else None
-            })
+        # Convert DataFrame to chunks format in bulk: nullable integer columns
+        # keep whole numbers, and missing values become None
+        for col in ['ang_number', 'prev_chunk_id', 'next_chunk_id']:
+            df[col] = df[col].astype('Int64')
+        df = df[_CSV_FIELDS].astype(object)
+        chunks = df.where(df.notna(), None).to_dict(orient='records')
         
         # Load chunks to ChromaDB
         success = load_chunks_to_chromadb(chunks)
@@ -455,22 +785,23 @@ def process():
         if os.path.exists(CSV_PATH):
             logger.info(f"CSV file exists: {CSV_PATH}")
             # Load data from CSV
-            load_data_from_csv(CSV_PATH)
+            success = load_data_from_csv(CSV_PATH)
         else:
             # Check if PDF exists
             if os.path.exists(PDF_PATH):
                 logger.info(f"PDF file exists: {PDF_PATH}")
-                # Process PDF
-                chunks = preprocess_gurbani_pdf(PDF_PATH)
-                # Save to CSV
-                save_chunks_to_csv(chunks, CSV_PATH)
-                # Load to ChromaDB
-                load_chunks_to_chromadb(chunks)
+                # Stream chunks from the PDF through the CSV writer into
+                # ChromaDB, one batch at a time. Closing the stream when
+                # loading stops early discards its temporary file, so a failed
+                # run leaves no CSV rather than a truncated one
+                chunks = iter_chunks_through_csv(iter_gurbani_pdf_chunks(PDF_PATH), CSV_PATH)
+                with closing(chunks):
+                    success = load_chunks_to_chromadb(chunks)
             else:
                 logger.error(f"Neither CSV nor PDF file exists. Please provide at least one of them.")
                 return False
         
-        return True
+        return success
     except Exception as e:
         logger.error(f"Error in processing pipeline: {str(e)}")
         return False
@@ -6,14 +6,70 @@ Embedding utilities for the Gurbani Insight application.
 Provides functions for generating text embeddings using Ollama API.
 """
 
+import asyncio
+import contextlib
 import logging
-import random
+import math
+import numpy as np
 import requests
-from typing import List
-from app.config import EMBEDDING_MODEL, OLLAMA_API_URL
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import List, Optional
+from app.config import EMBEDDING_DIM, EMBEDDING_MODEL, OLLAMA_API_URL
+from app.utils.embedding_cache import get_embedding_cache
 
 logger = logging.getLogger(__name__)
 
+# Batch embedding endpoint, accepting a list of inputs per request
+OLLAMA_EMBED_URL = OLLAMA_API_URL.replace("/embeddings", "/embed")
+OLLAMA_TAGS_URL = OLLAMA_API_URL.replace("/embeddings", "/tags")
+
+# Keep-alive session shared by all synchronous Ollama calls; embedding
+# requests are idempotent, so POSTs are retried on gateway errors too
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.1,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False
+    )
+))
+
+# Random generator for fallback embeddings
+_fallback_rng = np.random.default_rng()
+
+
+def reduce_embedding(embedding: List[float]) -> List[float]:
+    """
+    Unit-normalize an embedding, first truncating it to EMBEDDING_DIM
+    dimensions when configured.
+    
+    /api/embed returns unit-length vectors but the legacy /api/embeddings
+    endpoint does not, and both feed the same embedding cache and ChromaDB
+    index, so every embedding is normalized here to keep them comparable.
+    Matryoshka-trained models such as nomic-embed-text keep most of their
+    retrieval quality in the leading dimensions, so truncating shrinks the
+    ChromaDB index and distance computations at little cost in accuracy.
+    
+    Args:
+        embedding (List[float]): Full-size embedding, as returned by Ollama
+        
+    Returns:
+        List[float]: Unit-length embedding of at most EMBEDDING_DIM dimensions
+    """
+    if EMBEDDING_DIM and len(embedding) > EMBEDDING_DIM:
+        embedding = embedding[:EMBEDDING_DIM]
+    
+    norm = math.hypot(*embedding)
+    # Already unit length (or all zeros): nothing to rescale
+    if not norm or abs(norm - 1.0) < 1e-6:
+        return embedding
+    return [x / norm for x in embedding]
+
 
 def get_embedding(text: str) -> List[float]:
     """
@@ -26,14 +82,38 @@ def get_embedding(text: str) -> List[float]:
         List[float]: Vector embedding
     
     Notes:
+        Embeddings are looked up in the persistent embedding cache first.
         If the embedding generation fails, a random embedding is returned
         as a fallback to allow the application to continue functioning.
     """
+    embedding = get_embedding_or_none(text)
+    if embedding is None:
+        return get_fallback_embedding()
+    return embedding
+
+
+def get_embedding_or_none(text: str) -> Optional[List[float]]:
+    """
+    Get embeddings from Ollama API, reporting failures instead of falling back.
+    
+    Args:
+        text (str): Text to generate embedding for
+        
+    Returns:
+        Optional[List[float]]: Vector embedding, or None if Ollama could not
+            provide one
+    """
+    cache = get_embedding_cache()
+    if cache is not None:
+        cached = cache.get(text)
+        if cached is not None:
+            return reduce_embedding(cached)
+    
     try:
         # Log the attempt to connect to Ollama
         logger.info(f"Requesting embedding for text: {text[:50]}...")
         
-        response = requests.post(
+        response = _SESSION.post(
             OLLAMA_API_URL,
             json={"model": EMBEDDING_MODEL, "prompt": text},
             timeout=5  # Add a timeout to avoid hanging
@@ -43,24 +123,144 @@ def get_embedding(text: str) -> List[float]:
             embedding = response.json().get('embedding')
             if embedding:
                 logger.info(f"Successfully received embedding with {len(embedding)} dimensions")
-                return embedding
+                if cache is not None:
+                    cache.put(text, embedding)
+                return reduce_embedding(embedding)
             else:
                 logger.error(f"Embedding response missing 'embedding' field: {response.json()}")
-                return _get_fallback_embedding()
+                return None
         else:
             logger.error(f"Embedding API error: {response.text}")
-            return _get_fallback_embedding()
+            return None
             
     except requests.exceptions.ConnectionError:
         logger.error(f"Connection error to Ollama API at {OLLAMA_API_URL}. Is Ollama running?")
-        return _get_fallback_embedding()
+        return None
         
     except Exception as e:
         logger.error(f"Error getting embedding: {str(e)}")
-        return _get_fallback_embedding()
+        return None
+
+
+def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Get embeddings for several texts with a single Ollama request.
+    
+    Args:
+        texts (List[str]): Texts to generate embeddings for
+        
+    Returns:
+        List[List[float]]: Vector embeddings, in the same order as the texts
+    
+    Notes:
+        Texts found in the persistent embedding cache are not sent to Ollama.
+        If the batch endpoint fails, each remaining text is embedded
+        individually with get_embedding, which has its own random fallback.
+    """
+    if not texts:
+        return []
+    
+    cache = get_embedding_cache()
+    embeddings = cache.get_many(texts) if cache is not None else [None] * len(texts)
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if not missing:
+        return [reduce_embedding(embedding) for embedding in embeddings]
+    
+    missing_texts = [texts[i] for i in missing]
+    fetched = None
+    try:
+        logger.info(f"Requesting embeddings for {len(missing_texts)} texts ({len(texts) - len(missing)} cached)")
+        
+        response = _SESSION.post(
+            OLLAMA_EMBED_URL,
+            json={"model": EMBEDDING_MODEL, "input": missing_texts},
+            timeout=60  # Larger batches take longer to embed
+        )
+        
+        if response.status_code == 200:
+            fetched = response.json().get('embeddings')
+            if not fetched or len(fetched) != len(missing_texts):
+                logger.error("Batch embedding response missing 'embeddings' field")
+                fetched = None
+        else:
+            logger.error(f"Batch embedding API error: {response.text}")
+            
+    except Exception as e:
+        logger.error(f"Error getting batch embeddings: {str(e)}")
+    
+    if fetched is None:
+        logger.warning("Falling back to one embedding request per text")
+        fetched = [get_embedding(text) for text in missing_texts]
+    elif cache is not None:
+        cache.put_many(zip(missing_texts, fetched))
+    
+    for i, embedding in zip(missing, fetched):
+        embeddings[i] = embedding
+    
+    return [reduce_embedding(embedding) for embedding in embeddings]
+
+
+async def get_embeddings_async(texts: List[str], http_client,
+                               semaphore: Optional[asyncio.Semaphore] = None) -> List[List[float]]:
+    """
+    Get embeddings for several texts with a single asynchronous Ollama request.
+    
+    Args:
+        texts (List[str]): Texts to generate embeddings for
+        http_client (httpx.AsyncClient): Shared HTTP client
+        semaphore (asyncio.Semaphore, optional): Held while the request is in flight
+        
+    Returns:
+        List[List[float]]: Vector embeddings, in the same order as the texts
+    
+    Notes:
+        Behaves like get_embeddings: cached texts are not sent to Ollama, and
+        if the batch request fails each remaining text is embedded with
+        get_embedding in a worker thread.
+    """
+    if not texts:
+        return []
+    
+    cache = get_embedding_cache()
+    embeddings = cache.get_many(texts) if cache is not None else [None] * len(texts)
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if not missing:
+        return [reduce_embedding(embedding) for embedding in embeddings]
+    
+    missing_texts = [texts[i] for i in missing]
+    fetched = None
+    try:
+        async with semaphore or contextlib.nullcontext():
+            response = await http_client.post(
+                OLLAMA_EMBED_URL,
+                json={"model": EMBEDDING_MODEL, "input": missing_texts},
+                timeout=60  # Larger batches take longer to embed
+            )
+        
+        if response.status_code == 200:
+            fetched = response.json().get('embeddings')
+            if not fetched or len(fetched) != len(missing_texts):
+                logger.error("Batch embedding response missing 'embeddings' field")
+                fetched = None
+        else:
+            logger.error(f"Batch embedding API error: {response.text}")
+            
+    except Exception as e:
+        logger.error(f"Error getting batch embeddings: {str(e)}")
+    
+    if fetched is None:
+        logger.warning("Falling back to one embedding request per text")
+        fetched = [await asyncio.to_thread(get_embedding, text) for text in missing_texts]
+    elif cache is not None:
+        cache.put_many(zip(missing_texts, fetched))
+    
+    for i, embedding in zip(missing, fetched):
+        embeddings[i] = embedding
+    
+    return [reduce_embedding(embedding) for embedding in embeddings]
 
 
-def _get_fallback_embedding() -> List[float]:
+def get_fallback_embedding() -> List[float]:
     """
     Generate a fallback random embedding.
     
@@ -68,17 +268,148 @@ def _get_fallback_embedding() -> List[float]:
         List[float]: A random embedding vector
     """
     logger.warning("Using fallback random embedding")
-    return [random.uniform(-1, 1) for _ in range(768)]  # 768 dimensions for compatibility
+    # One vectorized draw instead of a Python call per dimension; match the
+    # stored embedding dimensions
+    return _fallback_rng.uniform(-1.0, 1.0, size=EMBEDDING_DIM or 768).astype(np.float32).tolist()
 
 
-def get_best_available_model() -> str:
+class AsyncEmbeddingBatcher:
     """
-    Find the best available model for text generation.
+    Coalesce concurrent embedding requests into batched Ollama calls.
+    
+    Callers await ``embed``; a background task collects requests arriving
+    within ``max_wait_ms`` (or until ``max_batch`` is reached) and sends them
+    to the ``/api/embed`` endpoint as a single request. Each batch is sent
+    from its own task, so a slow batch does not hold up the ones behind it.
+    If a ``semaphore`` is given, each batch request holds it while in flight.
+    Callers wait at most ``timeout`` seconds for their embedding.
+    """
+
+    def __init__(self, http_client, max_batch: int = 32, max_wait_ms: float = 8,
+                 semaphore: Optional[asyncio.Semaphore] = None, timeout: float = 10):
+        self.http_client = http_client
+        self.semaphore = semaphore or contextlib.nullcontext()
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self._queue = asyncio.Queue()
+        self._task = None
+        # Batches in flight, referenced so their tasks aren't garbage collected
+        self._flushes = set()
+
+    def start(self) -> None:
+        """Start the background batching task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background batching task and any batches in flight."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for flush in list(self._flushes):
+            flush.cancel()
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        """
+        Get the embedding for a text, batched with other pending requests.
+        
+        Args:
+            text (str): Text to generate embedding for
+            
+        Returns:
+            Optional[List[float]]: Vector embedding, or None if Ollama could
+                not provide one within the timeout
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out after {self.timeout}s waiting for query embedding")
+            return None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            
+            # Collect more requests until the batch is full or the window closes
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            flush = asyncio.create_task(self._flush(batch))
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch) -> None:
+        try:
+            texts = [text for text, _ in batch]
+            embeddings = await self._embed_batch(texts)
+            
+            if embeddings is None:
+                # Fall back to one concurrent request per text via the legacy endpoint
+                logger.warning("Batch embedding failed, falling back to per-text requests")
+                embeddings = await asyncio.gather(
+                    *(asyncio.to_thread(get_embedding_or_none, text) for text in texts)
+                )
+            
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+        except Exception as e:
+            logger.error(f"Error embedding batch: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            # Cancelled while in flight: release the waiting callers
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+
+    async def _embed_batch(self, texts: List[str]) -> Optional[List[List[float]]]:
+        try:
+            async with self.semaphore:
+                response = await self.http_client.post(
+                    OLLAMA_EMBED_URL,
+                    json={"model": EMBEDDING_MODEL, "input": texts},
+                    timeout=5
+                )
+            if response.status_code == 200:
+                embeddings = response.json().get('embeddings')
+                if embeddings and len(embeddings) == len(texts):
+                    return [reduce_embedding(embedding) for embedding in embeddings]
+                logger.error("Batch embedding response missing 'embeddings' field")
+            else:
+                logger.error(f"Batch embedding API error: {response.text}")
+        except Exception as e:
+            logger.error(f"Error getting batch embeddings: {str(e)}")
+        return None
+
+
+def select_best_model(available_models: List[str]) -> Optional[str]:
+    """
+    Pick the preferred text generation model from a list of available models.
     
+    Args:
+        available_models (List[str]): Names of the models installed in Ollama
+        
     Returns:
         str: Name of the best available model, or None if no models are available
     """
-    available_models = get_available_models()
     logger.info(f"Available models: {available_models}")
     
     # Models in order of preference
@@ -101,6 +432,29 @@ def get_best_available_model() -> str:
     return None
 
 
+def get_best_available_model() -> str:
+    """
+    Find the best available model for text generation.
+    
+    Returns:
+        str: Name of the best available model, or None if no models are available
+    """
+    return select_best_model(get_available_models())
+
+
+async def get_best_available_model_async(http_client) -> Optional[str]:
+    """
+    Async variant of get_best_available_model using a shared httpx client.
+    
+    Args:
+        http_client (httpx.AsyncClient): Shared client for Ollama requests
+        
+    Returns:
+        str: Name of the best available model, or None if no models are available
+    """
+    return select_best_model(await get_available_models_async(http_client))
+
+
 def get_available_models() -> List[str]:
     """
     Get list of available Ollama models.
@@ -109,13 +463,33 @@ def get_available_models() -> List[str]:
         List[str]: List of available model names
     """
     try:
-        response = requests.get(
-            OLLAMA_API_URL.replace("/embeddings", "/tags"),
+        response = _SESSION.get(
+            OLLAMA_TAGS_URL,
             timeout=2
         )
         if response.status_code == 200:
             return [model['name'] for model in response.json().get('models', [])]
         return []
+    except Exception as e:
+        logger.error(f"Error getting available models: {e}")
+        return []
+
+
+async def get_available_models_async(http_client) -> List[str]:
+    """
+    Async variant of get_available_models using a shared httpx client.
+    
+    Args:
+        http_client (httpx.AsyncClient): Shared client for Ollama requests
+        
+    Returns:
+        List[str]: List of available model names
+    """
+    try:
+        response = await http_client.get(OLLAMA_TAGS_URL, timeout=2)
+        if response.status_code == 200:
+            return [model['name'] for model in response.json().get('models', [])]
+        return []
     except Exception as e:
         logger.error(f"Error getting available models: {e}")
         return []
\ No newline at end of file
@@ -0,0 +1,137 @@
+# File: gurbani-insight/app/utils/embedding_cache.py
+
+"""
+Persistent embedding cache for the Gurbani Insight application.
+
+Stores embeddings in a local SQLite database keyed by a hash of the model
+name and text, so re-ingesting unchanged chunks doesn't call Ollama again.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Iterable, List, Optional, Tuple
+from app.config import EMBEDDING_CACHE_PATH, EMBEDDING_MODEL
+
+logger = logging.getLogger(__name__)
+
+# SQLite's default limit on host parameters per statement is 999
+_MAX_QUERY_KEYS = 900
+
+
+def make_embedding_key(text: str) -> str:
+    """
+    Build the cache key for a text embedded with the configured model.
+    
+    Args:
+        text (str): Embedded text
+        
+    Returns:
+        str: Hex SHA-256 digest of the model name and text
+    """
+    return hashlib.sha256((EMBEDDING_MODEL + '|' + text).encode()).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding store shared across threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vec BLOB NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """
+        Look up the cached embedding for a text.
+        
+        Args:
+            text (str): Embedded text
+            
+        Returns:
+            List[float] or None: Cached embedding, or None if not cached
+        """
+        return self.get_many([text])[0]
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up cached embeddings for several texts.
+        
+        Args:
+            texts (List[str]): Embedded texts
+            
+        Returns:
+            List[Optional[List[float]]]: Embeddings in text order, None where not cached
+        """
+        keys = [make_embedding_key(text) for text in texts]
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _MAX_QUERY_KEYS):
+                batch = keys[i:i + _MAX_QUERY_KEYS]
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                found.update(rows)
+        return [_unpack(found[key]) if key in found else None for key in keys]
+
+    def put(self, text: str, embedding: List[float]) -> None:
+        """
+        Store the embedding for a text.
+        
+        Args:
+            text (str): Embedded text
+            embedding (List[float]): Its embedding
+        """
+        self.put_many([(text, embedding)])
+
+    def put_many(self, items: Iterable[Tuple[str, List[float]]]) -> None:
+        """
+        Store embeddings for several texts.
+        
+        Args:
+            items (Iterable[Tuple[str, List[float]]]): (text, embedding) pairs
+        """
+        rows = [(make_embedding_key(text), len(embedding), array('f', embedding).tobytes())
+                for text, embedding in items]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, dim, vec) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    vec = array('f')
+    vec.frombytes(blob)
+    return vec.tolist()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Get the shared embedding cache, opening it on first use.
+    
+    Returns:
+        EmbeddingCache or None: The cache, or None if disabled or unavailable
+    """
+    global _cache
+    if _cache is None and EMBEDDING_CACHE_PATH:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    os.makedirs(os.path.dirname(EMBEDDING_CACHE_PATH) or ".", exist_ok=True)
+                    _cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
+                except Exception as e:
+                    logger.error(f"Error opening embedding cache at {EMBEDDING_CACHE_PATH}: {str(e)}")
+    return _cache
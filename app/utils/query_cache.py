@@ -0,0 +1,102 @@
+# File: gurbani-insight/app/utils/query_cache.py
+
+"""
+Query result caching for the Gurbani Insight application.
+
+Provides a thread-safe LRU cache with TTL expiration for search results,
+so repeated queries skip the embedding and ChromaDB round-trips.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def make_cache_key(query: str, top_k: int) -> str:
+    """
+    Build a cache key from a normalized query and result count.
+    
+    Args:
+        query (str): The search query
+        top_k (int): Number of results requested
+        
+    Returns:
+        str: Cache key
+    """
+    digest = hashlib.blake2b(query.strip().lower().encode(), digest_size=16).hexdigest()
+    return f"{digest}:{top_k}"
+
+
+class QueryCache:
+    """Thread-safe LRU cache with per-entry TTL expiration."""
+
+    def __init__(self, max_size: int = 2000, ttl_seconds: float = 600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached value.
+        
+        Args:
+            key (str): Cache key
+            
+        Returns:
+            Any or None: Cached value, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entry if full.
+        
+        Args:
+            key (str): Cache key
+            value (Any): Value to cache
+        """
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+        
+        Returns:
+            Dict[str, Any]: Size, hits, misses and hit rate
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
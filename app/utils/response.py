@@ -6,21 +6,90 @@ Response formatting utilities for the Gurbani Insight application.
 Provides functions for formatting search results into readable responses.
 """
 
+import asyncio
+import contextlib
+import json
 import logging
 import re
-import requests
-from typing import List, Dict, Any
-from app.utils.embedding import get_best_available_model
+import time
+import httpx
+from typing import List, Dict, Any, Optional, Tuple
+from app.config import OLLAMA_BASE_URL
+from app.utils.embedding import get_best_available_model_async
+from app.utils.search import SearchHit
 
 logger = logging.getLogger(__name__)
 
+# Ollama text generation endpoint
+OLLAMA_GENERATE_URL = f"{OLLAMA_BASE_URL}/api/generate"
 
-def format_results(results: List[Dict[str, Any]], format_type: str = "default") -> str:
+# Fields shared by every generate request; the options dict is never mutated,
+# so requests only copy the top level and add the model and prompt. Answers
+# are streamed so a slow generation can be cut off without losing its text
+_LLM_REQUEST_TEMPLATE = {
+    "stream": True,
+    "options": {
+        "temperature": 0.5,  # Lower temperature for more focused responses
+        "num_predict": 500,  # Allow for longer responses
+        "top_p": 0.85        # More focused token selection
+    }
+}
+
+# Patterns used while formatting results, compiled once at import
+# Words with internal capitals like "DhSangat", or starting with 1-2 caps like "Dh"
+_NONENGLISH_RE = re.compile(r'\b[A-Z][a-z]*[A-Z]\w*\b|\b[A-Z]{1,2}[a-z]+\b')
+_SENT_SPLIT_RE = re.compile(r'[.?!]')
+# Sentence ends and transliteration markers like "-ji", found in one scan
+_SENTENCE_SCAN_RE = re.compile(r'(?P<end>[.?!])|(?P<translit>-[a-z]{2,})')
+_CORE_CONCEPT_RE = re.compile(r'god|lord|divine|creator|universal|creation', re.IGNORECASE)
+
+
+def _has_raag(raag: Any) -> bool:
+    """Check whether a result's Raag is worth showing."""
+    return bool(raag) and raag != "None" and raag != "Unknown"
+
+
+def _format_source(r: SearchHit) -> str:
+    """
+    Format a result's source reference.
+    
+    Args:
+        r (SearchHit): Search result
+        
+    Returns:
+        str: Section and Ang, plus the Raag when known
+    """
+    if _has_raag(r.raag):
+        return f"{r.section}, Ang: {r.ang_number}, Raag: {r.raag}"
+    return f"{r.section}, Ang: {r.ang_number}"
+
+
+def _unique_sources(results: List[SearchHit]) -> List[str]:
+    """
+    Format source references, skipping results from an already listed source.
+    
+    Args:
+        results (List[SearchHit]): Search results
+        
+    Returns:
+        List[str]: Source references in result order, without duplicates
+    """
+    seen_src = set()
+    sources = []
+    for r in results:
+        key = (r.section, r.ang_number, r.raag)
+        if key not in seen_src:
+            seen_src.add(key)
+            sources.append(_format_source(r))
+    return sources
+
+
+def format_results(results: List[SearchHit], format_type: str = "default") -> str:
     """
     Format search results into a readable string.
     
     Args:
-        results (List[Dict[str, Any]]): Search results
+        results (List[SearchHit]): Search results
         format_type (str): Format type ("default", "chat", "summary", or "paragraph")
         
     Returns:
@@ -39,12 +108,62 @@ def format_results(results: List[Dict[str, Any]], format_type: str = "default")
         return _format_as_default(results)
 
 
-def _format_as_paragraph(results: List[Dict[str, Any]]) -> str:
+def format_results_columnar(results: List[SearchHit]) -> Dict[str, List[Any]]:
+    """
+    Convert search results into parallel per-field columns.
+    
+    Args:
+        results (List[SearchHit]): Search results
+        
+    Returns:
+        Dict[str, List[Any]]: Columns keyed by field name
+    """
+    # Transpose the result tuples into one column per field
+    columns = [list(column) for column in zip(*results)] if results else [[] for _ in SearchHit._fields]
+    scores, texts, ang_numbers, sections, raags, page_nums = columns
+    return {
+        "scores": scores,
+        "texts": texts,
+        "ang_numbers": ang_numbers,
+        "sections": sections,
+        "raags": raags,
+        "page_nums": page_nums
+    }
+
+
+def _iter_untransliterated_sentences(text: str):
+    """
+    Split text into sentences, skipping sentences with transliteration markers.
+    
+    Sentence ends and markers are found in a single regex scan, instead of
+    splitting first and then searching every sentence for markers.
+    
+    Args:
+        text (str): Text to split
+        
+    Yields:
+        str: Sentences (unstripped) that contain no transliteration marker
+    """
+    start = 0
+    has_marker = False
+    for match in _SENTENCE_SCAN_RE.finditer(text):
+        if match.lastgroup == 'translit':
+            has_marker = True
+            continue
+        if not has_marker:
+            yield text[start:match.start()]
+        start = match.end()
+        has_marker = False
+    if not has_marker:
+        yield text[start:]
+
+
+def _format_as_paragraph(results: List[SearchHit]) -> str:
     """
     Format results as a coherent paragraph.
     
     Args:
-        results (List[Dict[str, Any]]): Search results
+        results (List[SearchHit]): Search results
         
     Returns:
         str: Formatted paragraph response
@@ -52,49 +171,43 @@ def _format_as_paragraph(results: List[Dict[str, Any]]) -> str:
     # Create a coherent paragraph response using only English text from the passages
     response = "According to the Guru Granth Sahib, "
     
-    # Process each passage to extract meaningful English sentences
+    # Process each passage to extract meaningful English sentences, keeping
+    # a set alongside the ordered list for constant-time duplicate checks
     english_sentences = []
+    seen = set()
+    
+    # Bind hot lookups to locals for the per-sentence loop
+    remove_markers = _NONENGLISH_RE.sub
+    iter_sentences = _iter_untransliterated_sentences
+    add_seen = seen.add
+    append_sentence = english_sentences.append
     
     for r in results:
-        # Filter out non-English or transliteration text
-        text = r['text']
-        
-        # Replace "Dh", "N" and other non-English markers
-        text = re.sub(r'\b[A-Z][a-z]*[A-Z]\w*\b', '', text)  # Remove words with internal capitals like "DhSangat"
-        text = re.sub(r'\b[A-Z]{1,2}[a-z]+\b', '', text)     # Remove words starting with 1-2 caps like "Dh"
-        
-        # Split into sentences
-        sentences = re.split(r'[.?!]', text)
-        
-        for sentence in sentences:
-            # Clean up the sentence
+        # Filter out non-English or transliteration text: remove "Dh", "N"
+        # and other marker words, then split into sentences, dropping those
+        # with transliteration markers
+        for sentence in iter_sentences(remove_markers('', r.text)):
             sentence = sentence.strip()
             
-            # Skip if too short or contains transliteration markers
-            if len(sentence) < 10 or re.search(r'-[a-z]{2,}', sentence):
-                continue
-                
-            # Skip if the sentence has too many non-English words
-            words = sentence.split()
-            if len(words) < 3:
-                continue
-            
-            # Skip sentences that don't start with a capital letter or "the"
-            if not (sentence[0].isupper() or sentence.lower().startswith('the')):
-                continue
-            
-            # Add to our collection if it's meaningful
-            if len(sentence) > 20 and sentence not in english_sentences:
-                english_sentences.append(sentence)
+            # Keep meaningful sentences: long enough, starting with a capital
+            # letter or "the", at least three words, and not seen before
+            # (cheapest checks first)
+            if (len(sentence) > 20
+                    and (sentence[0].isupper() or sentence[:3].lower() == 'the')
+                    and len(sentence.split()) >= 3
+                    and sentence not in seen):
+                add_seen(sentence)
+                append_sentence(sentence)
     
     # Combine sentences into a coherent paragraph
     if english_sentences:
         # Start with core concept sentences
         core_concepts = [s for s in english_sentences if 
-                    re.search(r'(?i)god|lord|divine|creator|universal|creation', s)]
+                    _CORE_CONCEPT_RE.search(s)]
         
         # Add other sentences
-        other_sentences = [s for s in english_sentences if s not in core_concepts]
+        core_set = set(core_concepts)
+        other_sentences = [s for s in english_sentences if s not in core_set]
         
         # Combine in a logical order
         all_sentences = core_concepts + other_sentences
@@ -112,37 +225,32 @@ def _format_as_paragraph(results: List[Dict[str, Any]]) -> str:
     
     # Add source references at the end
     response += "\n\nThis wisdom comes from "
-    source_refs = []
-    for i, r in enumerate(results):
-        source = f"{r['section']}, Ang: {r['ang_number']}"
-        if r['raag'] and r['raag'] != "None" and r['raag'] != "Unknown":
-            source += f", Raag: {r['raag']}"
-        source_refs.append(source)
-    
+    source_refs = _unique_sources(results)
     response += "; ".join(source_refs) + " of the Guru Granth Sahib."
         
     return response
 
 
-def _format_as_summary(results: List[Dict[str, Any]]) -> str:
+def _format_as_summary(results: List[SearchHit]) -> str:
     """
     Format results as a bullet point summary.
     
     Args:
-        results (List[Dict[str, Any]]): Search results
+        results (List[SearchHit]): Search results
         
     Returns:
         str: Formatted summary response
     """
-    # Create a concise, direct response using only text from the passages
-    response = "Based on the Guru Granth Sahib:\n\n"
+    # Create a concise, direct response using only text from the passages,
+    # collecting the pieces in a list and joining them once
+    parts = ["Based on the Guru Granth Sahib:\n\n"]
     
     # Add core teachings from each passage without repeating similar content
     unique_points = set()
     
     for r in results:
         # Split text into sentences for easier handling
-        sentences = r['text'].split('.')
+        sentences = r.text.split('.')
         for sentence in sentences:
             sentence = sentence.strip()
             if len(sentence) > 15:  # Skip very short fragments
@@ -150,105 +258,170 @@ def _format_as_summary(results: List[Dict[str, Any]]) -> str:
                 simplified = ' '.join(sentence.lower().split())
                 if simplified not in unique_points:
                     unique_points.add(simplified)
-                    response += f"• {sentence}.\n"
+                    parts.append(f"• {sentence}.\n")
     
     # Add source references at the end
-    response += "\n---\n"
-    response += "Sources from Guru Granth Sahib:\n"
-    for i, r in enumerate(results):
-        response += f"- {r['section']}, Ang: {r['ang_number']}"
-        if r['raag'] and r['raag'] != "None" and r['raag'] != "Unknown":
-            response += f", Raag: {r['raag']}"
-        response += "\n"
+    parts.append("\n---\n")
+    parts.append("Sources from Guru Granth Sahib:\n")
+    parts.extend(f"- {source}\n" for source in _unique_sources(results))
         
-    return response
+    return ''.join(parts)
 
 
-def _format_as_chat(results: List[Dict[str, Any]]) -> str:
+def _format_as_chat(results: List[SearchHit]) -> str:
     """
     Format results as a chat response with passages.
     
     Args:
-        results (List[Dict[str, Any]]): Search results
+        results (List[SearchHit]): Search results
         
     Returns:
         str: Formatted chat response
     """
-    response = "Here are passages from Guru Granth Sahib that may answer your question:\n\n"
+    parts = ["Here are passages from Guru Granth Sahib that may answer your question:\n\n"]
+    seen_src = set()
     
     for i, r in enumerate(results):
-        response += f"**Passage {i+1}**\n"
-        response += f"Section: {r['section']}\n"
-        response += f"Ang: {r['ang_number']}\n"
+        parts.append(f"**Passage {i+1}**\n")
         
-        if r['raag'] and r['raag'] != "None" and r['raag'] != "Unknown":
-            response += f"Raag: {r['raag']}\n"
+        # Only give the source header the first time a source appears
+        key = (r.section, r.ang_number, r.raag)
+        if key not in seen_src:
+            seen_src.add(key)
+            parts.append(f"Section: {r.section}\n")
+            parts.append(f"Ang: {r.ang_number}\n")
             
-        response += f"Text: {r['text']}\n\n"
+            if _has_raag(r.raag):
+                parts.append(f"Raag: {r.raag}\n")
+            
+        parts.append(f"Text: {r.text}\n\n")
         
-    return response
+    return ''.join(parts)
 
 
-def _format_as_default(results: List[Dict[str, Any]]) -> str:
+def _format_as_default(results: List[SearchHit]) -> str:
     """
     Format results with default formatting including scores.
     
     Args:
-        results (List[Dict[str, Any]]): Search results
+        results (List[SearchHit]): Search results
         
     Returns:
         str: Default formatted response
     """
-    response = ""
+    parts = []
+    seen_src = set()
     
-    for i, r in enumerate(results):
-        response += f"Section: {r['section']}\n"
-        response += f"Ang: {r['ang_number']}\n"
-        
-        if r['raag'] and r['raag'] != "None" and r['raag'] != "Unknown":
-            response += f"Raag: {r['raag']}\n"
+    for r in results:
+        # Only give the source header the first time a source appears
+        key = (r.section, r.ang_number, r.raag)
+        if key not in seen_src:
+            seen_src.add(key)
+            parts.append(f"Section: {r.section}\n")
+            parts.append(f"Ang: {r.ang_number}\n")
             
-        response += f"Text: {r['text']}\n"
-        response += f"Score: {r['score']:.4f}\n\n"
+            if _has_raag(r.raag):
+                parts.append(f"Raag: {r.raag}\n")
+            
+        parts.append(f"Text: {r.text}\n")
+        parts.append(f"Score: {r.score:.4f}\n\n")
         
-    return response
+    return ''.join(parts)
 
 
-def format_results_with_llm(original_query: str, results: List[Dict[str, Any]]) -> str:
+def _prepare_llm_context(original_query: str, results: List[SearchHit]) -> Tuple[List[str], List[str], List[str]]:
     """
-    Generate a more coherent response using a language model.
+    Extract passages, source references and query-relevant sentences from results.
     
     Args:
         original_query (str): The user's original question
-        results (List[Dict[str, Any]]): List of retrieved passages
+        results (List[SearchHit]): List of retrieved passages
         
     Returns:
-        str: Formatted results with LLM-generated answer
+        Tuple[List[str], List[str], List[str]]: Passages, sources and relevant contexts
     """
-    # Extract the raw text and metadata from results
     passages = []
     sources = []
     relevant_contexts = []
+    query_terms = frozenset(original_query.lower().split())
     
     # Process each result to extract key information
     for r in results:
-        passage_text = r['text']
-        source = f"{r['section']}, Ang: {r['ang_number']}"
-        if r['raag'] and r['raag'] != "None" and r['raag'] != "Unknown":
-            source += f", Raag: {r['raag']}"
-        
+        passage_text = r.text
         passages.append(passage_text)
-        sources.append(source)
+        sources.append(_format_source(r))
         
-        # Extract sentences that might be specifically relevant to the query
-        query_terms = set(original_query.lower().split())
-        for sentence in re.split(r'[.!?]', passage_text):
+        # Extract sentences that might be specifically relevant to the query;
+        # only the first 5 are used in the prompt, so stop scanning once found
+        if not query_terms or len(relevant_contexts) >= 5:
+            continue
+        for sentence in _SENT_SPLIT_RE.split(passage_text):
             sentence = sentence.strip()
-            # Check if sentence contains query terms
-            sentence_terms = set(sentence.lower().split())
-            if query_terms.intersection(sentence_terms) and len(sentence) > 20:
+            # Check if sentence contains query terms; isdisjoint stops at the
+            # first shared word without building a set of the sentence's words
+            if len(sentence) > 20 and not query_terms.isdisjoint(sentence.lower().split()):
                 relevant_contexts.append(sentence)
+                if len(relevant_contexts) >= 5:
+                    break
     
+    return passages, sources, relevant_contexts
+
+
+# Static pieces of the answer prompt, with the question, relevant contexts,
+# passages and lowercased question inserted between them
+_PROMPT_PREFIX = (
+    "\n"
+    "            I'll help you answer this specific question about the Guru Granth Sahib:\n"
+    "            \n"
+    '            QUESTION: "'
+)
+_PROMPT_AFTER_QUERY = (
+    '"\n'
+    "            \n"
+    "            "
+)
+_PROMPT_AFTER_CONTEXTS = (
+    "\n"
+    "            \n"
+    "            Here are relevant passages from the Guru Granth Sahib:\n"
+    "            \n"
+    "            "
+)
+_PROMPT_AFTER_PASSAGES = (
+    "\n"
+    "            \n"
+    "            Please provide a specific, detailed response that directly answers the question. Your response should:\n"
+    "            \n"
+    "            1. Directly address the specific question being asked (about "
+)
+_PROMPT_SUFFIX = (
+    ")\n"
+    "            2. Provide concrete guidance, examples, or principles from the Guru Granth Sahib!\n"
+    "            3. Reference specific concepts or teachings that are relevant to this topic!\n"
+    "            4. Be practical and applicable, not just general spiritual advice\n"
+    "            5. Avoid generic spiritual statements that could apply to any question\n"
+    "            6. Be clear, profound, and spiritually insightful\n"
+    "            7. Stay on topic!\n"
+    "            8. Be 4-6 sentences in length\n"
+    "            \n"
+    "            Provide ONLY the conversational response with no introduction or explanation.\n"
+    "            "
+)
+
+
+def _build_llm_request(model: str, original_query: str, passages: List[str], relevant_contexts: List[str]) -> Dict[str, Any]:
+    """
+    Build the Ollama generate request body for a question.
+    
+    Args:
+        model (str): Name of the model to generate with
+        original_query (str): The user's original question
+        passages (List[str]): Retrieved passage texts
+        relevant_contexts (List[str]): Sentences matching the query terms
+        
+    Returns:
+        Dict[str, Any]: JSON body for the Ollama generate API
+    """
     # Add the most relevant contexts to the beginning of the prompt
     relevant_context_text = ""
     if relevant_contexts:
@@ -257,98 +430,198 @@ def format_results_with_llm(original_query: str, results: List[Dict[str, Any]])
     # Combine the passages into a single text
     combined_text = " ".join(passages)
     
-    # Find the best available model
-    model = get_best_available_model()
+    # Improved prompt that focuses on specificity and answering the exact question,
+    # assembled from the static pieces in one join
+    prompt = "".join((
+        _PROMPT_PREFIX, original_query,
+        _PROMPT_AFTER_QUERY, relevant_context_text,
+        _PROMPT_AFTER_CONTEXTS, combined_text,
+        _PROMPT_AFTER_PASSAGES, original_query.lower(),
+        _PROMPT_SUFFIX
+    ))
     
-    # Try to generate a response with the selected model
-    if model:
-        try:
-            logger.info(f"Generating answer with model: {model}")
-            
-            # Improved prompt that focuses on specificity and answering the exact question
-            prompt = f"""
-            I'll help you answer this specific question about the Guru Granth Sahib:
-            
-            QUESTION: "{original_query}"
-            
-            {relevant_context_text}
-            
-            Here are relevant passages from the Guru Granth Sahib:
-            
-            {combined_text}
-            
-            Please provide a specific, detailed response that directly answers the question. Your response should:
-            
-            1. Directly address the specific question being asked (about {original_query.lower()})
-            2. Provide concrete guidance, examples, or principles from the Guru Granth Sahib!
-            3. Reference specific concepts or teachings that are relevant to this topic!
-            4. Be practical and applicable, not just general spiritual advice
-            5. Avoid generic spiritual statements that could apply to any question
-            6. Be clear, profound, and spiritually insightful
-            7. Stay on topic!
-            8. Be 4-6 sentences in length
-            
-            Provide ONLY the conversational response with no introduction or explanation.
-            """
-            
-            # Call Ollama LLM with improved parameters
-            logger.info(f"Sending request to Ollama")
-            
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.5,  # Lower temperature for more focused responses
-                        "num_predict": 500,  # Allow for longer responses
-                        "top_p": 0.85        # More focused token selection
-                    }
-                },
-                timeout=25  # Increased timeout for more complex generation
-            )
-            
-            logger.info(f"Ollama response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                answer = response.json().get('response', '').strip()
-                # Check if the answer is reasonable
-                if len(answer) > 100:  # Ensure it's not too short
-                    logger.info(f"Successfully generated answer with {model}")
-                    return f"{answer}\n\nThis insight is based on teachings from {'; '.join(sources[:3])} of the Guru Granth Sahib."
-                else:
-                    logger.warning(f"Answer too short ({len(answer)} chars): {answer}")
+    return {**_LLM_REQUEST_TEMPLATE, "model": model, "prompt": prompt}
+
+
+# Total time allowed for a streamed answer, and the wait allowed between chunks
+LLM_ANSWER_DEADLINE = 25
+LLM_READ_TIMEOUT = 10
+
+
+def _parse_stream_line(line) -> Tuple[str, bool]:
+    """
+    Parse one line of a streamed Ollama generate response.
+    
+    Args:
+        line (str or bytes): JSON object for one chunk of the answer
         
-        except requests.exceptions.ConnectionError:
-            logger.error(f"Connection error to Ollama API. Is Ollama running?")
-        except Exception as e:
-            logger.error(f"Error generating answer with {model}: {e}")
-    else:
-        logger.warning("No LLM model available")
+    Returns:
+        Tuple[str, bool]: The chunk's text and whether generation is done
+    """
+    if not line:
+        return "", False
+    chunk = json.loads(line)
+    return chunk.get('response', ''), bool(chunk.get('done'))
+
+
+def _finish_streamed_answer(pieces: List[str], done: bool) -> str:
+    """
+    Join streamed answer pieces, trimming an unfinished answer to its last
+    complete sentence.
+    
+    Args:
+        pieces (List[str]): Text chunks received so far
+        done (bool): Whether the model finished generating
+        
+    Returns:
+        str: The answer text
+    """
+    answer = ''.join(pieces)
+    if not done:
+        logger.warning(f"Answer generation exceeded {LLM_ANSWER_DEADLINE}s, using the partial answer")
+        end = max(answer.rfind('.'), answer.rfind('!'), answer.rfind('?'))
+        answer = answer[:end + 1] if end >= 0 else ""
+    return answer
+
+
+def _accept_llm_answer(answer: str, model: str, sources: List[str]) -> Optional[str]:
+    """
+    Wrap an LLM answer with its sources if it is long enough to be useful.
+    
+    Args:
+        answer (str): Raw answer text from the model
+        model (str): Name of the model that generated the answer
+        sources (List[str]): Source references for the passages
+        
+    Returns:
+        str or None: Final response, or None if the answer is too short
+    """
+    answer = answer.strip()
+    # Check if the answer is reasonable
+    if len(answer) > 100:  # Ensure it's not too short
+        logger.info(f"Successfully generated answer with {model}")
+        return f"{answer}\n\nThis insight is based on teachings from {'; '.join(sources[:3])} of the Guru Granth Sahib."
+    
+    logger.warning(f"Answer too short ({len(answer)} chars): {answer}")
+    return None
+
+
+# Fallback answer templates by topic, in order of precedence, with the
+# keywords that select them (matched anywhere in the lowercased query)
+_FALLBACK_TEMPLATES = {
+    "anger": "The Guru Granth Sahib teaches that anger (krodh) is one of the five passions that distance us from spiritual truth. To manage anger, the sacred text advises regular meditation (simran), cultivating forgiveness, and remembering that all happens within God's will (hukam). By recognizing the divine light in all beings, we naturally become less reactive and more compassionate. The Gurbani also suggests that practicing contentment (santokh) and humility (nimrata) helps diminish anger and fosters inner peace.",
+    "meditation": "The Guru Granth Sahib emphasizes meditation (simran) on God's Name as the primary path to spiritual growth. The sacred text teaches that effective meditation involves focusing the mind with complete devotion, repeating God's Name with each breath, and maintaining awareness throughout daily activities. The Gurbani advises joining the company of saintly people (sadh sangat) to strengthen your practice, and suggests early morning (amrit vela) as the optimal time for meditation. Through consistent practice, one experiences inner peace, spiritual awakening, and liberation from the cycle of suffering.",
+    "ego": "According to the Guru Granth Sahib, ego (haumai) is the primary obstacle on the spiritual path. The sacred text teaches that ego creates separation from the divine and causes suffering through attachment and false identification. To overcome ego, the Gurbani prescribes selfless service (seva), meditation on God's Name, and surrendering to divine will (hukam). By recognizing that all accomplishments come from God rather than oneself, and by cultivating humility in the company of spiritually awakened souls, one gradually dissolves the ego and realizes the divine presence within."
+}
+_FALLBACK_KEYWORDS = {
+    "anger": ["anger", "angry", "frustration", "upset"],
+    "meditation": ["meditation", "meditate", "simran", "pray", "prayer"],
+    "ego": ["ego", "pride", "arrogance", "haumai"]
+}
+# One pass over the query; the lookahead also reports overlapping keywords
+_FALLBACK_KEYWORD_RE = re.compile('(?=' + '|'.join(
+    f"(?P<{kind}>{'|'.join(map(re.escape, keywords))})" for kind, keywords in _FALLBACK_KEYWORDS.items()
+) + ')')
+
+# Words ignored when picking the topic of a general fallback answer
+_STOPWORDS = frozenset({
+    "how", "what", "when", "where", "why", "is", "are", "to", "the", "and", "or", "of", "in", "with",
+    "about", "can", "do", "does", "should", "would", "i", "me", "my", "mine", "we", "our", "us"
+})
+
+
+def _build_fallback_response(original_query: str, sources: List[str]) -> str:
+    """
+    Build a question-specific template response when no LLM answer is available.
     
+    Args:
+        original_query (str): The user's original question
+        sources (List[str]): Source references for the passages
+        
+    Returns:
+        str: Template response with sources
+    """
     # Enhanced fallback response generation that's more question-specific
     logger.warning("Falling back to question-specific template response")
     
     # Create a more topic-specific fallback response based on the query
     query_lower = original_query.lower()
     
-    # Different templates for different question types
-    if any(term in query_lower for term in ["anger", "angry", "frustration", "upset"]):
-        fallback_response = "The Guru Granth Sahib teaches that anger (krodh) is one of the five passions that distance us from spiritual truth. To manage anger, the sacred text advises regular meditation (simran), cultivating forgiveness, and remembering that all happens within God's will (hukam). By recognizing the divine light in all beings, we naturally become less reactive and more compassionate. The Gurbani also suggests that practicing contentment (santokh) and humility (nimrata) helps diminish anger and fosters inner peace."
-    
-    elif any(term in query_lower for term in ["meditation", "meditate", "simran", "pray", "prayer"]):
-        fallback_response = "The Guru Granth Sahib emphasizes meditation (simran) on God's Name as the primary path to spiritual growth. The sacred text teaches that effective meditation involves focusing the mind with complete devotion, repeating God's Name with each breath, and maintaining awareness throughout daily activities. The Gurbani advises joining the company of saintly people (sadh sangat) to strengthen your practice, and suggests early morning (amrit vela) as the optimal time for meditation. Through consistent practice, one experiences inner peace, spiritual awakening, and liberation from the cycle of suffering."
-    
-    elif any(term in query_lower for term in ["ego", "pride", "arrogance", "haumai"]):
-        fallback_response = "According to the Guru Granth Sahib, ego (haumai) is the primary obstacle on the spiritual path. The sacred text teaches that ego creates separation from the divine and causes suffering through attachment and false identification. To overcome ego, the Gurbani prescribes selfless service (seva), meditation on God's Name, and surrendering to divine will (hukam). By recognizing that all accomplishments come from God rather than oneself, and by cultivating humility in the company of spiritually awakened souls, one gradually dissolves the ego and realizes the divine presence within."
-    
+    # Different templates for different question types; when keywords of
+    # several types appear, the earliest entry in _FALLBACK_TEMPLATES wins
+    found_kinds = {match.lastgroup for match in _FALLBACK_KEYWORD_RE.finditer(query_lower)}
+    kind = next((k for k in _FALLBACK_TEMPLATES if k in found_kinds), None)
+    if kind:
+        fallback_response = _FALLBACK_TEMPLATES[kind]
     else:
         # General fallback that tries to be somewhat specific to the query
         # Extract key nouns from the query to make the response more relevant
-        nouns = [word for word in query_lower.split() if word not in ["how", "what", "when", "where", "why", "is", "are", "to", "the", "and", "or", "of", "in", "with", "about", "can", "do", "does", "should", "would", "i", "me", "my", "mine", "we", "our", "us"]]
+        nouns = [word for word in query_lower.split() if word not in _STOPWORDS]
         topic = " and ".join(nouns[:2]) if nouns else "this spiritual matter"
         
         fallback_response = f"The Guru Granth Sahib addresses {topic} by emphasizing the importance of divine remembrance, truthful living, and selfless service. The sacred texts teach that by meditating on God's Name, we develop the spiritual wisdom to overcome obstacles and live in alignment with divine will. Through regular practice, cultivation of virtues like compassion, humility, and contentment, and by keeping the company of spiritually awakened souls, we experience transformation and find practical solutions to life's challenges."
     
-    return f"{fallback_response}\n\nThis insight is based on teachings from {'; '.join(sources[:3] if sources else ['various sections'])} of the Guru Granth Sahib."
\ No newline at end of file
+    return f"{fallback_response}\n\nThis insight is based on teachings from {'; '.join(sources[:3] if sources else ['various sections'])} of the Guru Granth Sahib."
+
+
+async def format_results_with_llm_async(original_query: str, results: List[SearchHit], http_client,
+                                        semaphore: Optional[asyncio.Semaphore] = None) -> str:
+    """
+    Generate a more coherent response using a language model, via a shared
+    httpx client.
+    
+    Args:
+        original_query (str): The user's original question
+        results (List[SearchHit]): List of retrieved passages
+        http_client (httpx.AsyncClient): Shared client for Ollama requests
+        semaphore (Optional[asyncio.Semaphore]): Limits concurrent Ollama requests
+        
+    Returns:
+        str: Formatted results with LLM-generated answer
+    """
+    passages, sources, relevant_contexts = _prepare_llm_context(original_query, results)
+    
+    # Find the best available model
+    model = await get_best_available_model_async(http_client)
+    
+    # Try to generate a response with the selected model
+    if model:
+        try:
+            logger.info(f"Generating answer with model: {model}")
+            logger.info("Sending request to Ollama")
+            
+            pieces = []
+            done = False
+            status_code = None
+            async with semaphore or contextlib.nullcontext():
+                deadline = time.monotonic() + LLM_ANSWER_DEADLINE
+                async with http_client.stream(
+                    "POST",
+                    OLLAMA_GENERATE_URL,
+                    json=_build_llm_request(model, original_query, passages, relevant_contexts),
+                    timeout=LLM_READ_TIMEOUT  # Applies between streamed chunks
+                ) as response:
+                    status_code = response.status_code
+                    if status_code == 200:
+                        # Read until the model is done or the deadline passes
+                        async for line in response.aiter_lines():
+                            text, done = _parse_stream_line(line)
+                            pieces.append(text)
+                            if done or time.monotonic() > deadline:
+                                break
+            
+            logger.info(f"Ollama response status: {status_code}")
+            
+            if status_code == 200:
+                answer = _accept_llm_answer(_finish_streamed_answer(pieces, done), model, sources)
+                if answer:
+                    return answer
+        
+        except httpx.ConnectError:
+            logger.error("Connection error to Ollama API. Is Ollama running?")
+        except Exception as e:
+            logger.error(f"Error generating answer with {model}: {e}")
+    else:
+        logger.warning("No LLM model available")
+    
+    return _build_fallback_response(original_query, sources)
@@ -9,50 +9,248 @@ Provides functions for searching and retrieving relevant passages from the Guru
 import logging
 import re
 import traceback
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, NamedTuple, Optional
 import chromadb
 from app.config import CHROMA_DB_PATH, COLLECTION_NAME
 from app.utils.embedding import get_embedding
 
 logger = logging.getLogger(__name__)
 
+class SearchHit(NamedTuple):
+    """A single search result; fields are read as attributes, not dict keys."""
+    score: float
+    text: str
+    ang_number: int
+    section: str
+    raag: str
+    page_num: int
+
+
 # Initialize ChromaDB client
 chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
 
+# Collection handle, looked up on first use and then reused
+_collection = None
+
+# Question type keywords used by expand_query, one named group per type,
+# compiled once at import
+_QTYPE_RE = re.compile(
+    r'\b(?:(?P<how>how|ways?)|(?P<what>what|explain|mean|meaning)'
+    r'|(?P<why>why|reason|purpose)|(?P<when>when))\b'
+)
+
+# Topic-specific expansion dictionary with more targeted terms
+_TOPIC_EXPANSIONS = {
+    "anger": ["krodh", "anger", "rage", "control emotions", "peace", "calm", "patience", 
+             "forgiveness", "tranquility", "conflict", "frustration", "equanimity"],
+
+    "meditation": ["simran", "meditation", "prayer", "naam", "recitation", "jap", "focus", 
+                  "concentration", "awareness", "mindfulness", "divine remembrance", "amrit vela"],
+
+    "ego": ["haumai", "ego", "pride", "arrogance", "humility", "self", "identity", 
+           "surrender", "submission", "attachment", "selfless", "nimrata"],
+
+    "fear": ["bhau", "fear", "anxiety", "worry", "courage", "faith", "trust", 
+            "divine protection", "surrender", "spiritual strength", "confidence"],
+
+    "wealth": ["dhan", "wealth", "money", "prosperity", "greed", "contentment", "attachment", 
+              "possessions", "material", "spiritual wealth", "true riches", "santokh"],
+
+    "relationships": ["family", "marriage", "love", "friendship", "community", "harmony", 
+                     "unity", "service", "sangat", "compassion", "respect", "support"],
+
+    "truth": ["sat", "truth", "reality", "honesty", "integrity", "authenticity", 
+             "falsehood", "illusion", "maya", "wisdom", "understanding", "realization"],
+
+    "duty": ["dharam", "duty", "responsibility", "action", "karma", "righteousness", 
+            "conduct", "ethics", "moral", "virtuous living", "discipline", "guidance"],
+
+    "liberation": ["mukti", "liberation", "salvation", "freedom", "release", "enlightenment", 
+                  "awakening", "realization", "union", "divine connection", "spiritual goal"],
+
+    "suffering": ["dukh", "suffering", "pain", "difficulty", "challenge", "comfort", 
+                 "relief", "peace", "healing", "acceptance", "resilience", "overcoming"]
+}
+
+# Common spiritual concepts
+_SPIRITUAL_CONCEPTS = {
+    "god": ["waheguru", "divine", "lord", "creator", "akal", "one", "supreme being", "truth", "hari", "prabh", "gopal", "ram"],
+    "meditation": ["simran", "naam", "jap", "recitation", "devotion", "prayer", "worship", "bhajan", "kirtan"],
+    "karma": ["action", "deed", "consequence", "dharma", "duty", "righteous", "virtue", "karam"],
+    "peace": ["contentment", "happiness", "joy", "bliss", "tranquility", "shanti", "harmony", "santokh", "sukh", "anand"],
+    "soul": ["atma", "spirit", "consciousness", "essence", "self", "being", "identity", "jot", "light"],
+    "salvation": ["mukti", "liberation", "freedom", "enlightenment", "realization", "union", "jivan-mukti"],
+    "illusion": ["maya", "attachment", "desire", "ego", "pride", "materialism", "worldly", "moh", "bharam", "haumai"],
+    "guru": ["teacher", "guide", "master", "wisdom", "knowledge", "teachings", "instruction", "satguru", "sant"],
+    "congregation": ["sangat", "community", "fellowship", "gathering", "company", "assembly", "sadh sangat", "sat sangat"],
+    "equality": ["justice", "fairness", "impartiality", "oneness", "unity", "brotherhood", "sarbat da bhala"]
+}
+
+
+def _build_trigger_index(expansions):
+    """
+    Map each trigger term (the key and its first 3 terms) to its entry.
+    
+    Args:
+        expansions (Dict[str, List[str]]): Expansion dictionary
+        
+    Returns:
+        Dict[str, List[str]]: Entries triggered by each term, in dictionary order
+    """
+    index = {}
+    for key, terms in expansions.items():
+        for trigger in [key, *terms[:3]]:
+            entries = index.setdefault(trigger, [])
+            if key not in entries:
+                entries.append(key)
+    return index
+
+
+def _match_triggers(tokens, index):
+    """
+    Look up query tokens in a trigger index.
+    
+    Args:
+        tokens (List[str]): Lowercased query words
+        index (Dict[str, List[str]]): Trigger index from _build_trigger_index
+        
+    Returns:
+        Set[str]: Entries triggered by any token
+    
+    Notes:
+        A token ending in "s" that is not a trigger itself is also looked up
+        without the "s", so plurals like "prayers" still match.
+    """
+    matched = set()
+    for token in tokens:
+        entries = index.get(token)
+        if entries is None and token.endswith('s'):
+            entries = index.get(token[:-1])
+        if entries:
+            matched.update(entries)
+    return matched
+
+
+# Terms added for each question type
+_QUESTION_TYPE_ADDITIONS = {
+    "how": ["method", "technique", "practice", "approach", "guidance", "instruction", "path", "discipline"],
+    "what": ["definition", "concept", "teaching", "principle", "explanation", "wisdom", "understanding"],
+    "why": ["purpose", "reason", "cause", "significance", "importance", "meaning", "goal"],
+    "when": ["time", "moment", "period", "circumstance", "condition", "stage", "phase"]
+}
+
+# Expansions are limited to this many distinct terms
+_MAX_EXPANSION_TERMS = 15
+
+
+def _join_expansion(terms):
+    """
+    Deduplicate expansion terms in order, limit them and join them.
+    
+    Args:
+        terms (List[str]): Expansion terms
+        
+    Returns:
+        str: Space-separated expansion, empty if there are no terms
+    """
+    return ' '.join(list(dict.fromkeys(terms))[:_MAX_EXPANSION_TERMS])
+
+
+# Joined expansion for every topic and question type (None for no type),
+# computed once at import
+_TOPIC_EXPANSION_STR = {
+    (topic, qtype): _join_expansion(terms + _QUESTION_TYPE_ADDITIONS.get(qtype, []))
+    for topic, terms in _TOPIC_EXPANSIONS.items()
+    for qtype in [None, *_QUESTION_TYPE_ADDITIONS]
+}
+
+
+@lru_cache(maxsize=256)
+def _concept_expansion_str(concepts, qtype):
+    """
+    Get the joined expansion for a combination of matched concepts.
+    
+    Args:
+        concepts (Tuple[str, ...]): Matched concepts, in dictionary order
+        qtype (str or None): Question type
+        
+    Returns:
+        str: Space-separated expansion, empty if there are no terms
+    """
+    terms = []
+    for concept in concepts:
+        terms.append(concept)
+        terms.extend(_SPIRITUAL_CONCEPTS[concept][:5])
+    terms.extend(_QUESTION_TYPE_ADDITIONS.get(qtype, []))
+    return _join_expansion(terms)
+
+
+# Inverted indexes from trigger word to the topics and concepts it triggers,
+# so a query costs one dict probe per word
+_TOPIC_TRIGGERS = _build_trigger_index(_TOPIC_EXPANSIONS)
+_TOPIC_PRIORITY = {topic: i for i, topic in enumerate(_TOPIC_EXPANSIONS)}
+_CONCEPT_TRIGGERS = _build_trigger_index(_SPIRITUAL_CONCEPTS)
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def _get_collection():
+    """
+    Get the ChromaDB collection, looking it up only on first use.
+    
+    Returns:
+        Collection: The collection (raises if it does not exist yet)
+    """
+    global _collection
+    if _collection is None:
+        _collection = chroma_client.get_collection(name=COLLECTION_NAME)
+    return _collection
+
 
-def search_similar_texts(query_text: str, top_k: int = 3) -> List[Dict[str, Any]]:
+def search_similar_texts(query_text: str, top_k: int = 3,
+                         query_embedding: Optional[List[float]] = None,
+                         collection=None) -> List[SearchHit]:
     """
     Search for texts similar to the query using ChromaDB.
     
     Args:
         query_text (str): The search query
         top_k (int): Number of results to return
+        query_embedding (Optional[List[float]]): Precomputed query embedding;
+            if omitted, the embedding is fetched from Ollama
+        collection: ChromaDB collection to search; if omitted, the module's
+            cached collection handle is used
         
     Returns:
-        List[Dict[str, Any]]: List of search results with metadata
+        List[SearchHit]: List of search results with metadata
     """
     try:
         # Get collection
-        collection = chroma_client.get_collection(name=COLLECTION_NAME)
-        logger.info(f"Got collection with {collection.count()} documents")
+        if collection is None:
+            collection = _get_collection()
+        # Counting documents costs a query of its own, so only do it for debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Got collection with {collection.count()} documents")
         
         # Get embedding for the query
-        try:
-            logger.info(f"Getting embedding for query: {query_text[:50]}...")
-            query_embedding = get_embedding(query_text)
-            logger.info(f"Got embedding with {len(query_embedding)} dimensions")
-        except Exception as e:
-            logger.error(f"Error getting embedding: {str(e)}")
-            logger.warning("Falling back to random embedding for search")
-            # Use the fallback embedding from the embedding module
-            query_embedding = get_embedding("")  # This will trigger fallback
+        if query_embedding is None:
+            try:
+                logger.info("Getting embedding for query: %.50s...", query_text)
+                query_embedding = get_embedding(query_text)
+                logger.info("Got embedding with %d dimensions", len(query_embedding))
+            except Exception as e:
+                logger.error(f"Error getting embedding: {str(e)}")
+                logger.warning("Falling back to random embedding for search")
+                # Use the fallback embedding from the embedding module
+                query_embedding = get_embedding("")  # This will trigger fallback
         
-        # Search
-        logger.info(f"Searching with top_k={top_k}")
+        # Search (log messages on this path use lazy %-formatting, so nothing
+        # is formatted when INFO is disabled)
+        logger.info("Searching with top_k=%d", top_k)
+        # Documents, metadatas and distances are included by default
         results = collection.query(
             query_embeddings=[query_embedding],
-            n_results=top_k,
-            include=["documents", "metadatas", "distances"]
+            n_results=top_k
         )
         
         # Check if we got any results
@@ -60,22 +258,23 @@ def search_similar_texts(query_text: str, top_k: int = 3) -> List[Dict[str, Any]
             logger.warning("No results returned from ChromaDB")
             return []
         
-        # Format results
+        # Format results; ChromaDB returns equal-length parallel lists, so
+        # walk them together (metadata may be None for a document)
         formatted_results = []
-        for i in range(len(results["ids"][0])):
-            # Safely get metadata values with defaults
-            metadata = results["metadatas"][0][i] if i < len(results["metadatas"][0]) else {}
-            
-            formatted_results.append({
-                'score': results["distances"][0][i] if i < len(results["distances"][0]) else 1.0,
-                'text': results["documents"][0][i] if i < len(results["documents"][0]) else "No text available.",
-                'ang_number': metadata.get('ang_number', 0),
-                'section': metadata.get('section', "Unknown"),
-                'raag': metadata.get('raag', ""),
-                'page_num': metadata.get('page_num', 0)
-            })
+        for distance, text, metadata in zip(
+            results["distances"][0], results["documents"][0], results["metadatas"][0]
+        ):
+            metadata = metadata or {}
+            formatted_results.append(SearchHit(
+                score=distance,
+                text=text,
+                ang_number=metadata.get('ang_number', 0),
+                section=metadata.get('section', "Unknown"),
+                raag=metadata.get('raag', ""),
+                page_num=metadata.get('page_num', 0)
+            ))
         
-        logger.info(f"Formatted {len(formatted_results)} results")
+        logger.info("Formatted %d results", len(formatted_results))
         return formatted_results
         
     except Exception as e:
@@ -84,6 +283,37 @@ def search_similar_texts(query_text: str, top_k: int = 3) -> List[Dict[str, Any]
         return []
 
 
+def _query_expansion(query_lower: str) -> str:
+    """
+    Get the expansion terms for a lowercased query.
+    
+    Args:
+        query_lower (str): The user query, lowercased
+        
+    Returns:
+        str: Space-separated expansion terms, empty if nothing matched
+    """
+    tokens = _WORD_RE.findall(query_lower)
+    
+    # Identify the question type in one scan; when keywords of several types
+    # appear, "how" takes precedence over "what", "why" and "when"
+    found_qtypes = {match.lastgroup for match in _QTYPE_RE.finditer(query_lower)}
+    qtype = next((t for t in _QUESTION_TYPE_ADDITIONS if t in found_qtypes), None)
+    
+    # First, check for topic-specific matches; if several topics match, the
+    # earliest one in _TOPIC_EXPANSIONS wins
+    matched_topics = _match_triggers(tokens, _TOPIC_TRIGGERS)
+    
+    if matched_topics:
+        topic = min(matched_topics, key=_TOPIC_PRIORITY.__getitem__)
+        return _TOPIC_EXPANSION_STR[(topic, qtype)]
+    
+    # If no topic match, try the general spiritual concepts
+    matched_concepts = _match_triggers(tokens, _CONCEPT_TRIGGERS)
+    concepts = tuple(concept for concept in _SPIRITUAL_CONCEPTS if concept in matched_concepts)
+    return _concept_expansion_str(concepts, qtype)
+
+
 def expand_query(query: str) -> str:
     """
     Expand the query with relevant terms to improve search results.
@@ -94,95 +324,42 @@ def expand_query(query: str) -> str:
     Returns:
         str: Expanded query for better semantic search
     """
-    query_lower = query.lower()
-    
-    # Topic-specific expansion dictionary with more targeted terms
-    topic_expansions = {
-        "anger": ["krodh", "anger", "rage", "control emotions", "peace", "calm", "patience", 
-                 "forgiveness", "tranquility", "conflict", "frustration", "equanimity"],
-        
-        "meditation": ["simran", "meditation", "prayer", "naam", "recitation", "jap", "focus", 
-                      "concentration", "awareness", "mindfulness", "divine remembrance", "amrit vela"],
-        
-        "ego": ["haumai", "ego", "pride", "arrogance", "humility", "self", "identity", 
-               "surrender", "submission", "attachment", "selfless", "nimrata"],
-        
-        "fear": ["bhau", "fear", "anxiety", "worry", "courage", "faith", "trust", 
-                "divine protection", "surrender", "spiritual strength", "confidence"],
-        
-        "wealth": ["dhan", "wealth", "money", "prosperity", "greed", "contentment", "attachment", 
-                  "possessions", "material", "spiritual wealth", "true riches", "santokh"],
-        
-        "relationships": ["family", "marriage", "love", "friendship", "community", "harmony", 
-                         "unity", "service", "sangat", "compassion", "respect", "support"],
-        
-        "truth": ["sat", "truth", "reality", "honesty", "integrity", "authenticity", 
-                 "falsehood", "illusion", "maya", "wisdom", "understanding", "realization"],
-        
-        "duty": ["dharam", "duty", "responsibility", "action", "karma", "righteousness", 
-                "conduct", "ethics", "moral", "virtuous living", "discipline", "guidance"],
-        
-        "liberation": ["mukti", "liberation", "salvation", "freedom", "release", "enlightenment", 
-                      "awakening", "realization", "union", "divine connection", "spiritual goal"],
-        
-        "suffering": ["dukh", "suffering", "pain", "difficulty", "challenge", "comfort", 
-                     "relief", "peace", "healing", "acceptance", "resilience", "overcoming"]
-    }
-    
-    # Common spiritual concepts
-    spiritual_concepts = {
-        "god": ["waheguru", "divine", "lord", "creator", "akal", "one", "supreme being", "truth", "hari", "prabh", "gopal", "ram"],
-        "meditation": ["simran", "naam", "jap", "recitation", "devotion", "prayer", "worship", "bhajan", "kirtan"],
-        "karma": ["action", "deed", "consequence", "dharma", "duty", "righteous", "virtue", "karam"],
-        "peace": ["contentment", "happiness", "joy", "bliss", "tranquility", "shanti", "harmony", "santokh", "sukh", "anand"],
-        "soul": ["atma", "spirit", "consciousness", "essence", "self", "being", "identity", "jot", "light"],
-        "salvation": ["mukti", "liberation", "freedom", "enlightenment", "realization", "union", "jivan-mukti"],
-        "illusion": ["maya", "attachment", "desire", "ego", "pride", "materialism", "worldly", "moh", "bharam", "haumai"],
-        "guru": ["teacher", "guide", "master", "wisdom", "knowledge", "teachings", "instruction", "satguru", "sant"],
-        "congregation": ["sangat", "community", "fellowship", "gathering", "company", "assembly", "sadh sangat", "sat sangat"],
-        "equality": ["justice", "fairness", "impartiality", "oneness", "unity", "brotherhood", "sarbat da bhala"]
-    }
-    
-    # First, check for topic-specific matches
-    expanded_terms = []
-    matched_topic = False
-    
-    for topic, terms in topic_expansions.items():
-        if topic in query_lower or any(term in query_lower for term in terms[:3]):
-            expanded_terms.extend(terms)
-            matched_topic = True
-            break
-    
-    # If no topic match, try the general spiritual concepts
-    if not matched_topic:
-        for concept, related_terms in spiritual_concepts.items():
-            if concept in query_lower or any(term in query_lower for term in related_terms[:3]):
-                expanded_terms.append(concept)
-                expanded_terms.extend(related_terms[:5])
-    
-    # Extract key phrases based on question type
-    question_type_additions = []
-    if re.search(r'\b(how|ways?)\b', query_lower):
-        question_type_additions = ["method", "technique", "practice", "approach", "guidance", "instruction", "path", "discipline"]
-    elif re.search(r'\b(what|explain|mean|meaning)\b', query_lower):
-        question_type_additions = ["definition", "concept", "teaching", "principle", "explanation", "wisdom", "understanding"]
-    elif re.search(r'\b(why|reason|purpose)\b', query_lower):
-        question_type_additions = ["purpose", "reason", "cause", "significance", "importance", "meaning", "goal"]
-    elif re.search(r'\bwhen\b', query_lower):
-        question_type_additions = ["time", "moment", "period", "circumstance", "condition", "stage", "phase"]
-    
-    # Add question type specific terms
-    expanded_terms.extend(question_type_additions)
-    
-    # Ensure no duplicates and limit expansion size
-    expanded_terms = list(set(expanded_terms))[:15]  # Limit to 15 terms
+    expansion = _query_expansion(query.lower())
     
     # If we found relevant concepts, add them to the query
-    if expanded_terms:
-        expanded_query = f"{query} {' '.join(expanded_terms)}"
+    if expansion:
+        expanded_query = f"{query} {expansion}"
         logger.info(f"Expanded query: {query} → {expanded_query}")
         return expanded_query
     else:
         # If no specific match, use minimal generic expansion
         logger.info(f"No specific match found for expansion, using original query: {query}")
-        return query
\ No newline at end of file
+        return query
+
+
+def batch_expand_query(queries: List[str]) -> List[str]:
+    """
+    Expand several queries at once, e.g. for bulk evaluation.
+    
+    Args:
+        queries (List[str]): The original user queries
+        
+    Returns:
+        List[str]: Expanded queries, in the same order; identical to calling
+            expand_query on each, but logged once for the whole batch
+    """
+    get_expansion = _query_expansion
+    expanded_queries = []
+    append = expanded_queries.append
+    expanded_count = 0
+    
+    for query in queries:
+        expansion = get_expansion(query.lower())
+        if expansion:
+            append(f"{query} {expansion}")
+            expanded_count += 1
+        else:
+            append(query)
+    
+    logger.info(f"Expanded {expanded_count} of {len(queries)} queries")
+    return expanded_queries